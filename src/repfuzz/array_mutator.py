@@ -0,0 +1,278 @@
+"""
+Mutators of numpy arrays and torch tensors.
+
+numpy and torch are looked up in `sys.modules` instead of being imported, since the fork
+server has to import the fuzzed library (which may be numpy or torch itself) under
+`dcov.LoaderWrapper` after this module has been imported. An array can only reach the
+mutators once its library has been imported anyway.
+
+The mutations work on whole arrays with vectorized operations. The layout mutations
+(shape, strides, contiguity) return views of the seed and cost O(1), the value mutations
+copy the array once and overwrite a few elements or bytes in place.
+"""
+
+import os
+import random
+import sys
+from typing import Callable, Optional
+
+from repfuzz.mutate import mutate_buffer
+
+_rng = None  # a numpy Generator, created lazily in each process
+
+
+def _reset_rng() -> None:
+    global _rng
+    _rng = None
+
+
+os.register_at_fork(after_in_child=_reset_rng)
+
+
+def _get_rng():
+    global _rng
+    if _rng is None:
+        # seeded from `random`, so `random.seed()` makes the array mutants reproducible too
+        _rng = sys.modules["numpy"].random.default_rng(random.getrandbits(64))
+    return _rng
+
+
+def _interesting_values(dtype):
+    np = sys.modules["numpy"]
+    if dtype.kind in "iu":
+        info = np.iinfo(dtype)
+        values = [info.min, info.max, 0, 1, info.max // 2 + 1]
+        if dtype.kind == "i":
+            values += [-1, info.min + 1]
+        return np.array(values, dtype=dtype)
+    if dtype.kind in "fc":
+        info = np.finfo(dtype)
+        values = [np.nan, np.inf, -np.inf, 0.0, -0.0, 1.0, info.max, info.min, info.tiny, info.eps]
+        values = np.array(values, dtype=dtype)
+        if dtype.kind == "c":
+            values = values + 1j * np.roll(values, 1)
+        return values
+    return None
+
+
+def _sample_size(n: int) -> int:
+    # AFL-style stacking: 1, 2, 4, ..., 64 elements at a time
+    return min(n, 1 << random.randint(0, 6))
+
+
+def mutate_array_values(old_val):
+    """
+    Overwrite a few elements with interesting values, e.g. NaN, Inf or the limits of the dtype.
+    """
+    if old_val.size == 0:
+        return old_val
+    new_val = old_val.copy()
+    flat = new_val.reshape(-1)  # a view, since the copy is C-contiguous
+    idx = _get_rng().integers(0, flat.size, size=_sample_size(flat.size))
+    if new_val.dtype.kind == "b":
+        flat[idx] = ~flat[idx]
+        return new_val
+    values = _interesting_values(new_val.dtype)
+    if values is None:
+        return mutate_array_bytes(old_val)
+    flat[idx] = _get_rng().choice(values, size=idx.size)
+    return new_val
+
+
+def mutate_array_bytes(old_val):
+    """
+    Mutate the raw bytes of the elements like AFL does, in place on a contiguous copy.
+    """
+    np = sys.modules["numpy"]
+    if old_val.size == 0 or old_val.dtype.hasobject or old_val.dtype.kind in "USb":
+        return mutate_array_layout(old_val)  # mutating them may create invalid objects
+    return mutate_buffer(np.array(old_val, order="C", copy=True))
+
+
+def mutate_array_dtype(old_val):
+    """
+    Cast the array to another dtype, e.g. float64 to int8 or to complex.
+    """
+    np = sys.modules["numpy"]
+    dtype = random.choice(
+        [
+            np.bool_,
+            np.int8,
+            np.uint8,
+            np.int32,
+            np.int64,
+            np.uint64,
+            np.float16,
+            np.float32,
+            np.float64,
+            np.complex128,
+            np.object_,
+        ]
+    )
+    try:
+        with np.errstate(all="ignore"):
+            return old_val.astype(dtype)
+    except (TypeError, ValueError):
+        return old_val
+
+
+def mutate_array_shape(old_val):
+    """
+    Reshape, transpose, add or remove axes, or empty the array. The result is a view.
+    """
+    np = sys.modules["numpy"]
+    choice = random.randint(0, 4)
+    if choice == 0:
+        return old_val[np.newaxis, ...]
+    if choice == 1 and old_val.ndim > 0:
+        return old_val[..., :0]  # keep the dtype and the number of axes, but no element
+    if choice == 2 and old_val.ndim > 1:
+        return old_val.transpose(_get_rng().permutation(old_val.ndim))
+    if choice == 3 and old_val.size > 1:
+        divisors = [d for d in range(2, min(old_val.size, 64) + 1) if old_val.size % d == 0]
+        if divisors:
+            d = random.choice(divisors)
+            return old_val.reshape(old_val.size // d, d)
+    return old_val.reshape(-1)
+
+
+def mutate_array_layout(old_val):
+    """
+    Change the strides or the contiguity of the array, e.g. a reversed, strided, broadcast
+    or Fortran-ordered array.
+    """
+    np = sys.modules["numpy"]
+    if old_val.ndim == 0:
+        return np.broadcast_to(old_val, (random.randint(1, 16),))  # zero stride, read-only
+    axis = random.randrange(old_val.ndim)
+    index = [slice(None)] * old_val.ndim
+    choice = random.randint(0, 3)
+    if choice == 0:
+        index[axis] = slice(None, None, -1)  # negative stride
+    elif choice == 1:
+        index[axis] = slice(None, None, random.randint(2, 4))  # not contiguous
+    elif choice == 2:
+        return np.broadcast_to(old_val, (random.randint(1, 4),) + old_val.shape)
+    else:
+        return np.asfortranarray(old_val) if old_val.ndim > 1 else old_val[::-1]
+    return old_val[tuple(index)]
+
+
+ARRAY_MUTATORS = [
+    mutate_array_values,
+    mutate_array_values,  # the values are mutated more often than the others
+    mutate_array_bytes,
+    mutate_array_dtype,
+    mutate_array_shape,
+    mutate_array_layout,
+]
+
+
+def mutate_ndarray(old_val):
+    return random.choice(ARRAY_MUTATORS)(old_val)
+
+
+def mutate_numpy_scalar(old_val):
+    np = sys.modules["numpy"]
+    mt = random.choice([mutate_array_values, mutate_array_bytes, mutate_array_dtype])
+    new_val = mt(np.asarray(old_val).reshape(1))
+    return new_val[0] if new_val.ndim == 1 and new_val.size == 1 else new_val
+
+
+def mutate_tensor(old_val):
+    """
+    Mutate a torch tensor through a numpy view of it.
+    """
+    torch = sys.modules["torch"]
+    try:
+        arr = old_val.detach().cpu().numpy()
+    except (TypeError, RuntimeError):  # e.g. bfloat16 or sparse tensors
+        return old_val
+    new_val = mutate_ndarray(arr)
+    if new_val.dtype.hasobject:
+        return old_val
+    try:
+        # torch doesn't support negative strides
+        return torch.from_numpy(sys.modules["numpy"].ascontiguousarray(new_val)).to(old_val.device)
+    except (TypeError, RuntimeError):
+        return old_val
+
+
+def copy_ndarray(old_val):
+    """
+    Copy an array with its shape and strides, e.g. a reversed or strided view made by
+    `mutate_array_layout`, which `ndarray.copy()` would make contiguous. A read-only array,
+    e.g. a broadcast one, can't be modified in place and is not copied.
+    """
+    np = sys.modules["numpy"]
+    if not old_val.flags.writeable:
+        return old_val
+    if (
+        type(old_val) is not np.ndarray
+        or old_val.dtype.hasobject
+        or old_val.flags.c_contiguous
+        or old_val.size == 0
+    ):
+        return old_val.copy(order="K")
+    shape, strides = old_val.shape, old_val.strides
+    lo = sum((n - 1) * s for n, s in zip(shape, strides) if s < 0)
+    hi = sum((n - 1) * s for n, s in zip(shape, strides) if s > 0) + old_val.itemsize
+    buf = np.empty(hi - lo, dtype=np.uint8)
+    new_val = np.ndarray(shape, old_val.dtype, buffer=buf, offset=-lo, strides=strides)
+    np.copyto(new_val, old_val)
+    return new_val
+
+
+def copy_tensor(old_val):
+    torch = sys.modules["torch"]
+    try:
+        new_val = torch.empty_strided(
+            old_val.size(), old_val.stride(), dtype=old_val.dtype, device=old_val.device
+        )
+        return new_val.copy_(old_val)
+    except RuntimeError:  # e.g. a sparse tensor
+        return old_val.clone()
+
+
+def shares_memory(new_val, old_val) -> bool:
+    """
+    Whether the array or tensor `new_val` may share its memory with `old_val`, e.g. a view.
+    """
+    if type(new_val) is not type(old_val):
+        return False
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(new_val, np.ndarray):
+        return np.may_share_memory(new_val, old_val)
+    try:
+        return new_val.untyped_storage().data_ptr() == old_val.untyped_storage().data_ptr()
+    except (AttributeError, RuntimeError):
+        return True
+
+
+def get_array_copier(cls: type) -> Optional[Callable]:
+    """
+    Get the copier of a numpy array or torch tensor type, None if `cls` is not one of them.
+    """
+    np = sys.modules.get("numpy")
+    if np is not None and issubclass(cls, np.ndarray):
+        return copy_ndarray
+    torch = sys.modules.get("torch")
+    if torch is not None and issubclass(cls, torch.Tensor):
+        return copy_tensor
+    return None
+
+
+def get_array_mutator(cls: type) -> Optional[Callable]:
+    """
+    Get the mutator of a numpy or torch type, None if `cls` is not one of them.
+    """
+    np = sys.modules.get("numpy")
+    if np is not None:
+        if issubclass(cls, np.ndarray):
+            return mutate_ndarray
+        if issubclass(cls, (np.number, np.bool_)):
+            return mutate_numpy_scalar
+    torch = sys.modules.get("torch")
+    if torch is not None and issubclass(cls, torch.Tensor):
+        return mutate_tensor
+    return None
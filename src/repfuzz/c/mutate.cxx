@@ -1,16 +1,58 @@
 #include<stdint.h>
 #define PY_SSIZE_T_CLEAN
 #include<Python.h>
+#include<pthread.h>
 #include<random>
 #include<ctime>
 
 #include "mutate.h"
 
+/* xoshiro256** (https://prng.di.unimi.it/), one state per thread, seeded from
+   std::random_device on first use or by `seed()`. */
+static thread_local u64 rng_state[4];
+static thread_local bool rng_seeded = false;
+
+static inline u64 rotl(const u64 x, int k) {
+    return (x << k) | (x >> (64 - k));
+}
+
+static inline u64 splitmix64(u64& x) {
+    u64 z = (x += 0x9e3779b97f4a7c15ULL);
+    z = (z ^ (z >> 30)) * 0xbf58476d1ce4e5b9ULL;
+    z = (z ^ (z >> 27)) * 0x94d049bb133111ebULL;
+    return z ^ (z >> 31);
+}
+
+static void rng_seed(u64 seed) {
+    for (int i = 0; i < 4; i++) rng_state[i] = splitmix64(seed);
+    rng_seeded = true;
+}
+
+static inline u64 rng_next(void) {
+    if (!rng_seeded) {
+        std::random_device rd; // 非确定性随机数生成器, 只在第一次使用时读取
+        rng_seed(((u64)rd() << 32) | rd());
+    }
+    u64* s = rng_state;
+    const u64 result = rotl(s[1] * 5, 7) * 9;
+    const u64 t = s[1] << 17;
+    s[2] ^= s[0];
+    s[3] ^= s[1];
+    s[1] ^= s[2];
+    s[0] ^= s[3];
+    s[2] ^= t;
+    s[3] = rotl(s[3], 45);
+    return result;
+}
+
+/* A forked child must not replay the random numbers of its parent. */
+static void rng_reset_after_fork(void) {
+    rng_seeded = false;
+}
+
+/* 返回 0到_max-1 之间的均匀分布随机数 */
 inline u32 UR(u32 _max){
-    std::random_device rd; // 非确定性随机数生成器
-    std::mt19937 gen(rd()); // 使用 rd()作为种子初始化 mt19937
-    std::uniform_int_distribution<u32> dis(0, _max - 1); // 生成 0到_max-1 之间的均匀分布随机数
-    return dis(gen); // 返回生成的随机数
+    return (u32)(((rng_next() >> 32) * (u64)_max) >> 32);
 }
 
 /* Helper to choose random block len for block operations in fuzz_one().
@@ -60,12 +102,12 @@ inline void bitflip1(u8* _ar, u32 len){
 
 inline void byte_interesting(u8* _ar, u32 len) {
     if (!len) return;
-    _ar[UR(len)] = interesting_8[UR(sizeof(interesting_8))];
+    _ar[UR(len)] = interesting_8[UR(ARRAY_LEN(interesting_8))];
 }
 
 inline void word_interesting(u8* _ar, u32 len){
     if(len<2) return;
-    s16 n = interesting_16[UR(sizeof(interesting_16))];
+    s16 n = interesting_16[UR(ARRAY_LEN(interesting_16))];
     if (UR(2)){
         *(u16*)(_ar + UR(len-1)) = n;
     } else {
@@ -75,7 +117,7 @@ inline void word_interesting(u8* _ar, u32 len){
 
 inline void dword_interesting(u8* _ar, u32 len){
     if (len<4) return;
-    s32 n = interesting_32[UR(sizeof(interesting_32))];
+    s32 n = interesting_32[UR(ARRAY_LEN(interesting_32))];
     if (UR(2)){
         *(u32*)(_ar + UR(len-3)) = n;
     } else {
@@ -185,13 +227,14 @@ inline void str_growth(u8*& _ar, u32& len){
     }else{
         memset(new_buf+growth_to, UR(2)?UR(256):_ar[UR(len)], growth_len);
     }
+    memcpy(new_buf+growth_to+growth_len, _ar+growth_to, len-growth_to);
     free(_ar);
     _ar = new_buf;
     len += growth_len;
     _ar[len] = '\0';
 }
 
-void havoc(u8 *ar, u32& len, bool is_str){
+void havoc(u8*& ar, u32& len, bool is_str){
     u32 use_stacking = 1 << (1+UR(7));
     u16 op=0;
     for(size_t i=0; i< use_stacking; i++){
@@ -236,14 +279,72 @@ void havoc(u8 *ar, u32& len, bool is_str){
     }
 }
 
+static PyObject* int_mutant(long arg){
+    s32 val = (s32)arg;
+    u8* buf = (u8*)&val;
+    u32 len = sizeof(val);
+    havoc(buf, len, false);
+    return PyLong_FromLong(val);
+}
+
+static PyObject* float_mutant(double val){
+    u8* buf = (u8*)&val;
+    u32 len = sizeof(double);
+    havoc(buf, len, false);
+    return PyFloat_FromDouble(val);
+}
+
+static PyObject* str_mutant(const char* str, Py_ssize_t len){
+    u8* new_str = (u8*)malloc(len+1);
+    if (!new_str) return PyErr_NoMemory();
+    memcpy(new_str, str, len);
+    new_str[len] = '\0';
+    u32 x = (u32)len;
+    havoc(new_str, x, true);
+    /* The mutated bytes may not be valid UTF-8 any more, so they are decoded as latin-1. */
+    PyObject* ret = PyUnicode_DecodeLatin1((const char*)new_str, x, NULL);
+    free(new_str);
+    return ret;
+}
+
+static PyObject* bytes_mutant(const char* bytes, Py_ssize_t len){
+    u8* new_bytes = (u8*)malloc(len+1);
+    if (!new_bytes) return PyErr_NoMemory();
+    memcpy(new_bytes, bytes, len);
+    new_bytes[len] = '\0';
+    u32 x = (u32)len;
+    havoc(new_bytes, x, true);
+    PyObject* ret = PyBytes_FromStringAndSize((const char*)new_bytes, x);
+    free(new_bytes);
+    return ret;
+}
+
+/* Builds a list of `k` mutants in one call, `make` returns a new reference or NULL. */
+template<typename F>
+static PyObject* mutants(Py_ssize_t k, F make){
+    if (k < 0){
+        PyErr_SetString(PyExc_ValueError, "the number of mutants must be non-negative");
+        return NULL;
+    }
+    PyObject* list = PyList_New(k);
+    if (!list) return NULL;
+    for (Py_ssize_t i = 0; i < k; i++){
+        PyObject* item = make();
+        if (!item){
+            Py_DECREF(list);
+            return NULL;
+        }
+        PyList_SET_ITEM(list, i, item);
+    }
+    return list;
+}
+
 static PyObject* mutate_int(PyObject* self, PyObject* args) {
-    s32 val;
-    if (!PyArg_ParseTuple(args, "l", &val)){
+    long arg;
+    if (!PyArg_ParseTuple(args, "l", &arg)){
         return NULL;
     }
-    u32 len = 4;
-    havoc((u8 *)&val, len, false);
-    return PyLong_FromLong(val);
+    return int_mutant(arg);
 }
 
 static PyObject* mutate_float(PyObject* self, PyObject* args){
@@ -251,41 +352,100 @@ static PyObject* mutate_float(PyObject* self, PyObject* args){
     if (!PyArg_ParseTuple(args, "d", &val)){
         return NULL;
     }
-    u32 len = sizeof(double);
-    havoc((u8 *)&val, len, false);
-    return PyFloat_FromDouble(val);
+    return float_mutant(val);
 }
 
 static PyObject* mutate_str(PyObject* self, PyObject* args){
-    char* str, *new_str;
-    int len;
+    const char* str;
+    Py_ssize_t len;
     if (!PyArg_ParseTuple(args, "s#", &str, &len)){
         return NULL;
     }
-    new_str = (char*)malloc(len+1);
-    strcpy(new_str, str);
-    new_str[len] = '\0';
-    u32 x = (u32)len;
-    havoc((u8 *)new_str, x, true);
-    #if PY_MINOR_VERSION == 13
-    return PyUnicode_FromKindAndData(PyUnicode_1BYTE_KIND, new_str, x);
-    #else
-    return _PyUnicode_FromASCII(new_str, x);
-    #endif
+    return str_mutant(str, len);
 }
 
 static PyObject* mutate_bytes(PyObject* self, PyObject* args){
-    u8* bytes, *new_bytes;
-    int len;
+    const char* bytes;
+    Py_ssize_t len;
     if (!PyArg_ParseTuple(args, "y#", &bytes, &len)){
         return NULL;
     }
-    new_bytes = (u8*)malloc(len+1);
-    strcpy((char*)new_bytes, (const char*)bytes);
-    new_bytes[len] = '\0';
-    u32 x = (u32)len;
-    havoc((u8 *)new_bytes, x, true);
-    return PyBytes_FromStringAndSize((const char*)new_bytes, x);
+    return bytes_mutant(bytes, len);
+}
+
+static PyObject* mutate_int_n(PyObject* self, PyObject* args) {
+    long arg;
+    Py_ssize_t k;
+    if (!PyArg_ParseTuple(args, "ln", &arg, &k)){
+        return NULL;
+    }
+    return mutants(k, [&]{ return int_mutant(arg); });
+}
+
+static PyObject* mutate_float_n(PyObject* self, PyObject* args){
+    double val;
+    Py_ssize_t k;
+    if (!PyArg_ParseTuple(args, "dn", &val, &k)){
+        return NULL;
+    }
+    return mutants(k, [&]{ return float_mutant(val); });
+}
+
+static PyObject* mutate_str_n(PyObject* self, PyObject* args){
+    const char* str;
+    Py_ssize_t len, k;
+    if (!PyArg_ParseTuple(args, "s#n", &str, &len, &k)){
+        return NULL;
+    }
+    return mutants(k, [&]{ return str_mutant(str, len); });
+}
+
+static PyObject* mutate_bytes_n(PyObject* self, PyObject* args){
+    const char* bytes;
+    Py_ssize_t len, k;
+    if (!PyArg_ParseTuple(args, "y#n", &bytes, &len, &k)){
+        return NULL;
+    }
+    return mutants(k, [&]{ return bytes_mutant(bytes, len); });
+}
+
+/* Mutates a writable buffer (bytearray, memoryview, numpy array...) in place and returns it.
+   A read-only buffer (bytes...) is copied once into a new bytes object which is mutated and
+   returned instead, i.e. copy-on-write. The length of the buffer is never changed. */
+static PyObject* mutate_buffer(PyObject* self, PyObject* args){
+    PyObject* obj;
+    Py_buffer view;
+    if (!PyArg_ParseTuple(args, "O", &obj)){
+        return NULL;
+    }
+    if (PyObject_GetBuffer(obj, &view, PyBUF_WRITABLE | PyBUF_C_CONTIGUOUS) == 0){
+        u8* buf = (u8*)view.buf;
+        u32 len = (u32)MIN(view.len, (Py_ssize_t)UINT32_MAX);
+        havoc(buf, len, false);
+        PyBuffer_Release(&view);
+        Py_INCREF(obj);
+        return obj;
+    }
+    PyErr_Clear();
+    if (PyObject_GetBuffer(obj, &view, PyBUF_C_CONTIGUOUS) != 0){
+        return NULL;
+    }
+    PyObject* ret = PyBytes_FromStringAndSize((const char*)view.buf, view.len);
+    PyBuffer_Release(&view);
+    if (!ret) return NULL;
+    u8* buf = (u8*)PyBytes_AS_STRING(ret);
+    u32 len = (u32)MIN(PyBytes_GET_SIZE(ret), (Py_ssize_t)UINT32_MAX);
+    havoc(buf, len, false);
+    return ret;
+}
+
+static PyObject* seed(PyObject* self, PyObject* args){
+    unsigned long long val;
+    if (!PyArg_ParseTuple(args, "K", &val)){
+        return NULL;
+    }
+    rng_seed((u64)val);
+    Py_RETURN_NONE;
 }
 
 static PyMethodDef mutate_methods[] = {
@@ -293,6 +453,12 @@ static PyMethodDef mutate_methods[] = {
     {"mutate_float", mutate_float, METH_VARARGS, "Mutates the float like AFL does"},
     {"mutate_str", mutate_str, METH_VARARGS, "Mutates the string like AFL does"},
     {"mutate_bytes", mutate_bytes, METH_VARARGS, "Mutates the bytes like AFL does"},
+    {"mutate_int_n", mutate_int_n, METH_VARARGS, "Returns a list of k mutants of the integer"},
+    {"mutate_float_n", mutate_float_n, METH_VARARGS, "Returns a list of k mutants of the float"},
+    {"mutate_str_n", mutate_str_n, METH_VARARGS, "Returns a list of k mutants of the string"},
+    {"mutate_bytes_n", mutate_bytes_n, METH_VARARGS, "Returns a list of k mutants of the bytes"},
+    {"mutate_buffer", mutate_buffer, METH_VARARGS, "Mutates a buffer in place, or a copy of it if it is read-only"},
+    {"seed", seed, METH_VARARGS, "Seeds the random number generator of the calling thread"},
     { NULL, NULL, 0, NULL }
 };
 
@@ -308,5 +474,6 @@ static struct PyModuleDef mutate = {
 PyMODINIT_FUNC
 PyInit_mutate(void)
 {
+    pthread_atfork(NULL, NULL, rng_reset_after_fork);
     return PyModule_Create(&mutate);
 }
@@ -20,6 +20,8 @@ typedef int64_t  s64;
 #  define MAX(_a,_b) ((_a) > (_b) ? (_a) : (_b))
 #endif 
 
+#define ARRAY_LEN(_a) (sizeof(_a) / sizeof((_a)[0]))
+
 #define SWAP16(_x) ({ \
     uint16_t _ret = (_x); \
     (uint16_t)((_ret << 8) | (_ret >> 8)); \
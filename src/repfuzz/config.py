@@ -30,10 +30,32 @@ class GENERATION:
     prompt_option = "wo_phase1"  # one of [C, NT, NS, wo_phase1], default C
 
 
+class DATABASE:
+    flush_size = 64
+    flush_interval = 1
+    chunk_size = 256  # the rows fetched at a time by the streaming accessors
+
+
 class FUZZ:
     iters_per_api = int(1e2)
+    max_iters_per_api = int(1e3)
     iters_per_seed = int(1e1)
     pop_size = 10
+    plateau_iters = 40
+    exec_timeout = 1.0  # seconds per execution, the watchdog of the worker interrupts it then
+    exec_timeout_grace = 0.5  # seconds between the escalation steps of the watchdog
+    max_timeouts_per_api = 3  # stop fuzzing an API after this many interrupted executions
+    stall_timeout = 10  # seconds without a heartbeat outside the executions, e.g. in an API call
+    heartbeat_interval = 0.1
+    repro_size = 4
+    repro_api_call_capacity = 1 << 16
+    repro_capacity = 1 << 20
+    repro_record_capacity = 1 << 14  # the mutant serialized before each execution
+    repro_timeout = 1
+    time_budget = None  # seconds per library, None means unlimited
+    exec_budget = None  # executions per library, None means unlimited
+    log_wrapper_coverage = False  # log the coverage of every call to an instrumented function
+    instrument_plan_dir = DATA_DIR.joinpath("instrument_plan")  # cached per library version
     timeout_dir = PROJECT_DIR.joinpath("output", "timeout")
     crash_dir = PROJECT_DIR.joinpath("output", "crash")
     potential_bugs = PROJECT_DIR.joinpath("output", "potential_bugs")
@@ -0,0 +1,171 @@
+import os
+import time
+from pathlib import Path
+from sqlite3 import Connection
+
+from repfuzz.config import FUZZFILE_PATH
+from repfuzz.database.sqlite_proxy import BufferedWriter, connect
+
+# The status of a campaign
+IMPORTING = "importing"
+FUZZING = "fuzzing"
+DONE = "done"
+FAILED = "failed"
+
+# The status of a worker or of an API, besides FUZZING and DONE
+RUNNING = "running"
+TIMEOUT = "timeout"
+
+
+def _create_tables(conn: Connection) -> None:
+    with conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS campaign (run_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "library, pid, jobs, status, start_time, end_time)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS worker (run_id, worker_id, pid, status, updated, "
+            "PRIMARY KEY (run_id, worker_id))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS api_status (run_id, full_name, status, updated, "
+            "PRIMARY KEY (run_id, full_name))"
+        )
+
+
+class Campaign:
+    """
+    The state of one fuzzing campaign of a library: its status, the status of its workers
+    and of the APIs it has fuzzed.
+
+    The state is stored in `FUZZFILE_PATH` under the run id of the campaign, so the
+    campaigns running on the same machine at the same time don't clobber each other.
+
+    Each process keeps a long-lived connection to the database, opened on first use, and
+    an in-memory mirror of the status, so `can_fuzz` never touches the database. A forked
+    child inherits the mirror of its parent and opens its own connection.
+    """
+
+    def __init__(self, run_id: int, library_name: str, db_path: Path | None = None) -> None:
+        self.run_id = run_id
+        self.library_name = library_name
+        self.db_path = db_path or FUZZFILE_PATH
+        self.status = IMPORTING
+        self.api_status: dict[str, str] = {}
+        self._pid = None
+        self._conn = None
+        self._api_writer = None
+
+    @classmethod
+    def create(cls, library_name: str, jobs: int, db_path: Path | None = None) -> "Campaign":
+        """
+        Register a new campaign of a library with the status IMPORTING.
+
+        Args:
+            library_name (str): The name of the library to be fuzzed.
+            jobs (int): The number of workers of the campaign.
+            db_path (Path | None): The database of the campaigns, `FUZZFILE_PATH` by default.
+
+        Returns:
+            Campaign: The new campaign.
+        """
+        db_path = db_path or FUZZFILE_PATH
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = connect(db_path)
+        _create_tables(conn)
+        with conn:
+            cur = conn.execute(
+                "INSERT INTO campaign (library, pid, jobs, status, start_time) VALUES (?, ?, ?, ?, ?)",
+                (library_name, os.getpid(), jobs, IMPORTING, time.time()),
+            )
+        campaign = cls(cur.lastrowid, library_name, db_path)
+        campaign._pid, campaign._conn = os.getpid(), conn
+        return campaign
+
+    @property
+    def conn(self) -> Connection:
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._conn = connect(self.db_path)
+            self._api_writer = None
+        return self._conn
+
+    def set_status(self, status: str) -> None:
+        self.status = status
+        end_time = time.time() if status in (DONE, FAILED) else None
+        with self.conn:
+            self.conn.execute(
+                "UPDATE campaign SET status = ?, end_time = ? WHERE run_id = ?",
+                (status, end_time, self.run_id),
+            )
+
+    def set_worker_status(self, worker_id: int, pid: int, status: str) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO worker VALUES (?, ?, ?, ?, ?)",
+                (self.run_id, worker_id, pid, status, time.time()),
+            )
+
+    def set_api_status(self, full_name: str, status: str) -> None:
+        """
+        Set the status of an API. A FUZZING row is buffered, the final status (DONE or
+        TIMEOUT) is written through with it, so a worker killed by its parent later on
+        doesn't lose the APIs it has finished and fuzz them again once restarted.
+
+        A DONE status is never downgraded, e.g. by the parent killing a worker after it
+        has finished the API. Call `load_api_status` first in the processes which don't set
+        the status of the API themselves.
+        """
+        if self.api_status.get(full_name) == DONE:
+            return
+        self.api_status[full_name] = status
+        conn = self.conn  # opens the connection of a forked child, and drops the parent's writer
+        if self._api_writer is None:
+            self._api_writer = BufferedWriter(conn, "api_status", 4, on_conflict="REPLACE")
+        self._api_writer.add((self.run_id, full_name, status, time.time()))
+        if status != FUZZING:
+            self._api_writer.flush()
+
+    def load_api_status(self) -> None:
+        """
+        Mirror the status of the APIs recorded by the other processes of the campaign,
+        e.g. the APIs fuzzed by the previous worker of a shard before it was killed.
+        """
+        cur = self.conn.execute(
+            "SELECT full_name, status FROM api_status WHERE run_id = ?", (self.run_id,)
+        )
+        self.api_status.update(cur.fetchall())
+
+    def can_fuzz(self, full_name: str) -> bool:
+        """
+        Whether an API may be fuzzed: the library is ready and the API has not been fuzzed
+        (or timed out) in this campaign yet.
+        """
+        return self.status == FUZZING and full_name not in self.api_status
+
+    def flush(self) -> None:
+        if self._api_writer is not None and self._pid == os.getpid():
+            self._api_writer.flush()
+
+
+def get_campaigns(db_path: Path | None = None, library_name: str | None = None) -> list[tuple]:
+    """
+    Get the campaigns, the latest first.
+
+    Args:
+        db_path (Path | None): The database of the campaigns, `FUZZFILE_PATH` by default.
+        library_name (str | None): Only get the campaigns of this library.
+
+    Returns:
+        list[tuple]: `(run_id, library, pid, jobs, status, start_time, end_time)` rows.
+    """
+    conn = connect(db_path or FUZZFILE_PATH)
+    _create_tables(conn)
+    query = "SELECT * FROM campaign"
+    params: tuple = ()
+    if library_name is not None:
+        query += " WHERE library = ?"
+        params = (library_name,)
+    rows = conn.execute(query + " ORDER BY run_id DESC", params).fetchall()
+    conn.close()
+    return rows
@@ -39,9 +39,12 @@ class API(Dictable):
     kwonly_arg_list = field(type=list[Argument], default=Factory(list))
 
 
+# The columns of the api table, the arguments are stored in the argument table.
+API_COLUMNS = ["full_name", "type", "source", "doc", "num_normal_arg", "num_kwonly_arg"]
+ARGUMENT_FIELDS = ["normal_arg_list", "kwonly_arg_list"]
+
+
 def adapt_API(api: API) -> tuple:
-    normal_arg_list = [arg.to_dict() for arg in api.normal_arg_list]
-    kwonly_arg_list = [arg.to_dict() for arg in api.kwonly_arg_list]
     return (
         api.full_name,
         api.type,
@@ -49,23 +52,35 @@ def adapt_API(api: API) -> tuple:
         api.doc,
         api.num_normal_arg,
         api.num_kwonly_arg,
-        json.dumps(normal_arg_list).encode("utf-8"),
-        json.dumps(kwonly_arg_list).encode("utf-8"),
     )
 
 
-def convert_API(api_sql: tuple) -> API:
-    normal_arg_list = json.loads(api_sql[6].decode("utf-8"))
-    normal_arg_list = [Argument(**arg) for arg in normal_arg_list]
-    kwonly_arg_list = json.loads(api_sql[7].decode("utf-8"))
-    kwonly_arg_list = [Argument(**arg) for arg in kwonly_arg_list]
-    return API(
-        full_name=api_sql[0],
-        type=api_sql[1],
-        source=api_sql[2],
-        doc=api_sql[3],
-        num_normal_arg=api_sql[4],
-        num_kwonly_arg=api_sql[5],
-        normal_arg_list=normal_arg_list,
-        kwonly_arg_list=kwonly_arg_list,
+def convert_API(api_sql: tuple, columns: list[str] = API_COLUMNS) -> API:
+    """
+    Convert a row of the api table, whose columns are `columns`, to an API without arguments.
+    """
+    return API(**dict(zip(columns, api_sql)))
+
+
+def adapt_arguments(api: API) -> list[tuple]:
+    """
+    Convert the arguments of an API to `(full_name, kind, position, name, type, example_value_list)`
+    rows of the argument table, where kind is "normal" or "kwonly".
+    """
+    rows = []
+    for kind, arg_list in (("normal", api.normal_arg_list), ("kwonly", api.kwonly_arg_list)):
+        for position, arg in enumerate(arg_list):
+            example_value_list = json.dumps(arg.example_value_list)
+            rows.append((api.full_name, kind, position, arg.name, arg.type, example_value_list))
+    return rows
+
+
+def convert_argument(argument_sql: tuple) -> Argument:
+    """
+    Convert a `(name, type, example_value_list)` row of the argument table to an Argument.
+    """
+    return Argument(
+        name=argument_sql[0],
+        type=argument_sql[1],
+        example_value_list=json.loads(argument_sql[2]),
     )
@@ -1,24 +1,122 @@
+import atexit
+import json
+import os
 import sqlite3
+import threading
+import time
+from pathlib import Path
 from sqlite3 import Connection, Cursor
+from typing import Iterator
+
+from repfuzz.config import DATABASE, LIBRARY_DATA_DIR
+from repfuzz.database.models import (
+    API,
+    API_COLUMNS,
+    ARGUMENT_FIELDS,
+    Argument,
+    adapt_API,
+    adapt_arguments,
+    convert_API,
+    convert_argument,
+)
+
+SCHEMA_VERSION = 3
+
+# The columns identifying a row, rows duplicating them are ignored on insertion.
+UNIQUE_KEYS = {
+    "public_api": ["full_name"],
+    "api": ["full_name"],
+    "api_call": ["full_name", "api_call"],
+    "fuzzed_api": ["full_name"],
+}
+
+
+# The connection registry of this process: each thread has its own connection to each
+# database, and the schema of a database is only bootstrapped by the first of them.
+_connections = threading.local()
+_bootstrapped: set[Path] = set()
+_registry_lock = threading.RLock()
+
+
+def connect(db_path: Path, **kwargs) -> Connection:
+    """
+    Open a new connection to a SQLite database in WAL mode, so the processes of a campaign
+    can write to it while the others read it. Use `get_or_create_db` for the databases of
+    the libraries, which caches the connections.
+
+    Args:
+        db_path (Path): The path of the database.
+        **kwargs: The other arguments of `sqlite3.connect`.
 
-from repfuzz.config import FUZZFILE_PATH, LIBRARY_DATA_DIR
-from repfuzz.database.models import API, adapt_API, convert_API
+    Returns:
+        Connection: The new connection.
+    """
+    conn = sqlite3.connect(db_path, **kwargs)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # WAL is still consistent after a crash
+    return conn
 
 
 def get_or_create_db(db_name: str) -> Connection:
     """
     Get or create a SQLite database.
 
+    The connection is opened once per thread and reused by the later calls, so this
+    function is cheap enough for the hot paths. The database is opened in WAL mode, so
+    the fuzzing workers can write to it while other processes read it, and its schema is
+    migrated to `SCHEMA_VERSION` the first time the process opens it.
+
     Args:
         db_name (str): The name of the database.
 
     Returns:
-        Connection: The SQLite database connection.
+        Connection: The SQLite database connection of the calling thread.
     """
-    LIBRARY_DATA_DIR.mkdir(parents=True, exist_ok=True)
+    key = (LIBRARY_DATA_DIR, db_name)
+    conns: dict[tuple[Path, str], Connection] = _connections.__dict__
+    conn = conns.get(key)
+    if conn is not None:
+        return conn
     db_path = LIBRARY_DATA_DIR.joinpath(db_name + ".db")
-    conn = sqlite3.connect(db_path)
+    with _registry_lock:
+        if db_path not in _bootstrapped:
+            LIBRARY_DATA_DIR.mkdir(parents=True, exist_ok=True)
+            conn = connect(db_path)
+            _migrate(conn)
+            _bootstrapped.add(db_path)
+    if conn is None:
+        conn = connect(db_path)
+    conns[key] = conn
+    return conn
+
+
+def _migrate(conn: Connection) -> None:
+    """
+    Migrate the schema of a database from its `PRAGMA user_version` to `SCHEMA_VERSION`.
+
+    The migration runs in a single transaction which locks the database, so the processes
+    opening the database at the same time don't migrate it twice.
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
     cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        version = cur.execute("PRAGMA user_version").fetchone()[0]
+        for migration in MIGRATIONS[version:]:
+            migration(cur)
+        cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def _migrate_v1(cur: Cursor) -> None:
+    """
+    Create the tables, and add unique indexes to the tables of older versions of RepFuzz
+    after removing their duplicate rows (only the first one is kept).
+    """
     _create_table(cur, "public_api", ["full_name"])
     _create_table(
         cur,
@@ -36,8 +134,66 @@ def get_or_create_db(db_name: str) -> Connection:
     )
     _create_table(cur, "api_call", ["full_name", "api_call"])
     _create_table(cur, "fuzzed_api", ["full_name"])
-    _create_table(cur, "fuzz_record", ["date", "exec_num", "time_cost", "py_cov"])
-    return conn
+    _create_table(
+        cur,
+        "fuzz_record",
+        ["date", "exec_num", "time_cost", "py_cov", "restart_num", "restart_cost", "startup_cost"],
+    )
+    _add_missing_columns(
+        cur, "fuzz_record", ["py_cov", "restart_num", "restart_cost", "startup_cost"]
+    )
+    _create_table(
+        cur, "api_fuzz_stat", ["date", "full_name", "exec_num", "cov_gain", "time_cost", "seed_num"]
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS api_fuzz_stat_date ON api_fuzz_stat (date)")
+    for table_name, columns in UNIQUE_KEYS.items():
+        columns_str = ", ".join(columns)
+        cur.execute(
+            f"DELETE FROM {table_name} WHERE rowid NOT IN "
+            f"(SELECT MIN(rowid) FROM {table_name} GROUP BY {columns_str})"
+        )
+        cur.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {table_name}_unique ON {table_name} ({columns_str})"
+        )
+
+
+def _migrate_v2(cur: Cursor) -> None:
+    """
+    Move the arguments of the APIs from the JSON blobs of the api table to the argument
+    table, one row per argument, so that the APIs can be loaded without decoding them.
+    """
+    _create_table(
+        cur, "argument", ["full_name", "kind", "position", "name", "type", "example_value_list"]
+    )
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS argument_unique ON argument (full_name, kind, position)"
+    )
+    cur.execute(
+        "SELECT full_name, normal_arg_list, kwonly_arg_list FROM api "
+        "WHERE normal_arg_list IS NOT NULL OR kwonly_arg_list IS NOT NULL"
+    )
+    for full_name, normal_arg_list, kwonly_arg_list in cur.fetchall():
+        api = API(
+            full_name=full_name,
+            normal_arg_list=[Argument(**arg) for arg in json.loads(normal_arg_list or "[]")],
+            kwonly_arg_list=[Argument(**arg) for arg in json.loads(kwonly_arg_list or "[]")],
+        )
+        cur.executemany(
+            "INSERT OR IGNORE INTO argument VALUES (?, ?, ?, ?, ?, ?)", adapt_arguments(api)
+        )
+    cur.execute("UPDATE api SET normal_arg_list = NULL, kwonly_arg_list = NULL")
+
+
+def _migrate_v3(cur: Cursor) -> None:
+    """
+    Record the number of executions of an API interrupted by the watchdog, and the
+    latency of the slowest one.
+    """
+    _add_missing_columns(cur, "api_fuzz_stat", ["timeout_num", "max_latency"])
+
+
+# MIGRATIONS[i] migrates a database from version i to version i + 1.
+MIGRATIONS = [_migrate_v1, _migrate_v2, _migrate_v3]
 
 
 def _create_table(cur: Cursor, table_name: str, columns: list[str]) -> None:
@@ -46,61 +202,295 @@ def _create_table(cur: Cursor, table_name: str, columns: list[str]) -> None:
     cur.execute(query)
 
 
+def _add_missing_columns(cur: Cursor, table_name: str, columns: list[str]) -> None:
+    """
+    Add the `columns` that a table created by an older version of RepFuzz lacks.
+    """
+    cur.execute(f"SELECT name FROM pragma_table_info('{table_name}')")
+    existing = {row[0] for row in cur.fetchall()}
+    for column in columns:
+        if column not in existing:
+            cur.execute(f"ALTER TABLE {table_name} ADD COLUMN {column} DEFAULT 0")
+
+
+class BufferedWriter:
+    """
+    Buffer the rows inserted into a table and write them with `executemany` in a single
+    transaction, once `flush_size` rows are buffered or `flush_interval` seconds after the
+    last write, instead of committing every row. Duplicate rows are ignored, or replace
+    the existing ones if `on_conflict` is "REPLACE".
+
+    A writer can be shared by several threads if its connection is opened with
+    `check_same_thread=False`.
+    """
+
+    def __init__(
+        self,
+        conn: Connection,
+        table_name: str,
+        num_columns: int,
+        flush_size: int = DATABASE.flush_size,
+        flush_interval: float = DATABASE.flush_interval,
+        on_conflict: str = "IGNORE",
+    ) -> None:
+        self.conn = conn
+        placeholders = ", ".join("?" * num_columns)
+        self.query = f"INSERT OR {on_conflict} INTO {table_name} VALUES ({placeholders})"
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.rows: list[tuple] = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.RLock()
+
+    def add(self, row: tuple) -> None:
+        with self.lock:
+            self.rows.append(row)
+            if (
+                len(self.rows) >= self.flush_size
+                or time.monotonic() - self.last_flush >= self.flush_interval
+            ):
+                self.flush()
+
+    def flush(self) -> None:
+        with self.lock:
+            self.last_flush = time.monotonic()
+            if not self.rows:
+                return
+            with self.conn:
+                self._write(self.rows)
+            self.rows.clear()
+
+    def _write(self, rows: list) -> None:
+        self.conn.executemany(self.query, rows)
+
+    def __enter__(self) -> "BufferedWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.flush()
+
+
+class APIWriter(BufferedWriter):
+    """
+    A buffered writer of the api table, to which API objects are added. Their arguments are
+    written to the argument table in the same transaction.
+    """
+
+    def _write(self, rows: list[API]) -> None:
+        _insert_apis(self.conn, rows)
+
+
+_buffered_writers: dict[tuple[Path, str], BufferedWriter] = {}
+
+
+def _reset_caches() -> None:
+    # a forked child must open its own connections, the schema is already bootstrapped.
+    global _connections
+    _connections = threading.local()
+    _buffered_writers.clear()
+
+
+os.register_at_fork(after_in_child=_reset_caches)
+
+
+def get_buffered_writer(
+    db_name: str, table_name: str, num_columns: int, writer_cls: type = BufferedWriter
+) -> BufferedWriter:
+    """
+    Get the buffered writer of this process for a table of a database, it is shared by
+    all the threads and has its own connection.
+
+    Call `flush_buffered_writers` before the process exits.
+    """
+    key = (LIBRARY_DATA_DIR.joinpath(db_name + ".db"), table_name)
+    writer = _buffered_writers.get(key)
+    if writer is None:
+        with _registry_lock:
+            writer = _buffered_writers.get(key)
+            if writer is None:
+                get_or_create_db(db_name)  # bootstrap the schema
+                conn = connect(key[0], check_same_thread=False)
+                writer = _buffered_writers[key] = writer_cls(conn, table_name, num_columns)
+    return writer
+
+
+def get_api_writer(db_name: str) -> APIWriter:
+    """
+    Rows are added as API objects.
+    """
+    return get_buffered_writer(db_name, "api", len(API_COLUMNS), APIWriter)
+
+
+def get_api_call_writer(db_name: str) -> BufferedWriter:
+    """
+    Rows are added as `(full_name, api_call)`.
+    """
+    return get_buffered_writer(db_name, "api_call", 2)
+
+
+def get_fuzzed_api_writer(db_name: str) -> BufferedWriter:
+    return get_buffered_writer(db_name, "fuzzed_api", 1)
+
+
+def get_api_fuzz_stat_writer(db_name: str) -> BufferedWriter:
+    return get_buffered_writer(db_name, "api_fuzz_stat", 8)
+
+
+def flush_buffered_writers() -> None:
+    for writer in list(_buffered_writers.values()):
+        writer.flush()
+
+
+# A stage exiting normally or with sys.exit() (e.g. on SIGINT) keeps its buffered rows,
+# the workers forked by the fuzzer leave with os._exit() and flush them by themselves.
+atexit.register(flush_buffered_writers)
+
+
 def set_public_apis(conn: Connection, public_apis: list[str]) -> None:
-    cur = conn.cursor()
-    cur.execute("DELETE FROM public_api")
-    for api in public_apis:
-        cur.execute("INSERT INTO public_api VALUES (?)", (api,))
-    conn.commit()
+    with conn:
+        conn.execute("DELETE FROM public_api")
+        conn.executemany(
+            "INSERT OR IGNORE INTO public_api VALUES (?)", ((api,) for api in public_apis)
+        )
+
+
+def _insert_apis(conn: Connection, apis: list[API]) -> None:
+    columns_str = ", ".join(API_COLUMNS)
+    conn.executemany(
+        f"INSERT OR IGNORE INTO api ({columns_str}) VALUES ({', '.join('?' * len(API_COLUMNS))})",
+        (adapt_API(api) for api in apis),
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO argument VALUES (?, ?, ?, ?, ?, ?)",
+        (row for api in apis for row in adapt_arguments(api)),
+    )
 
 
 def insert_into_api(conn: Connection, api: API):
-    data = adapt_API(api)
-    cur = conn.cursor()
-    cur.execute("INSERT INTO api VALUES (?, ?, ?, ?, ?, ?, ?, ?)", data)
-    conn.commit()
+    with conn:
+        _insert_apis(conn, [api])
+
+
+def insert_many_into_api(conn: Connection, apis: list[API]) -> None:
+    """
+    Insert the APIs and their arguments in a single transaction.
+    """
+    with conn:
+        _insert_apis(conn, apis)
 
 
 def insert_into_fuzzed_api(conn: Connection, full_name: str) -> None:
     cur = conn.cursor()
-    cur.execute("INSERT INTO fuzzed_api VALUES (?)", (full_name,))
+    cur.execute("INSERT OR IGNORE INTO fuzzed_api VALUES (?)", (full_name,))
     conn.commit()
 
 
-def get_all_apis(conn: Connection) -> list[API]:
+def insert_many_into_fuzzed_api(conn: Connection, full_names: list[str]) -> None:
+    """
+    Insert the full names of the fuzzed APIs in a single transaction.
+    """
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO fuzzed_api VALUES (?)", ((name,) for name in full_names)
+        )
+
+
+def _query_apis(
+    conn: Connection, fields: list[str] | None, where: str = "", params: tuple = ()
+) -> list[API]:
+    """
+    Load the APIs matching `where`, only the requested fields are read and the others
+    keep their default values. The arguments are only read if one of `ARGUMENT_FIELDS`
+    is requested.
+    """
+    fields = fields or API_COLUMNS + ARGUMENT_FIELDS
+    columns = ["full_name"] + [f for f in API_COLUMNS if f in fields and f != "full_name"]
+    cur = conn.cursor()
+    cur.execute(f"SELECT {', '.join(columns)} FROM api {where}", params)
+    apis = [convert_API(row, columns) for row in cur.fetchall()]
+    if not apis or not any(f in fields for f in ARGUMENT_FIELDS):
+        return apis
+
+    by_name = {api.full_name: api for api in apis}
+    cur.execute(
+        "SELECT full_name, kind, name, type, example_value_list FROM argument "
+        f"WHERE full_name IN (SELECT full_name FROM api {where}) ORDER BY full_name, kind, position",
+        params,
+    )
+    for row in cur:
+        api = by_name.get(row[0])
+        if api is None:
+            continue
+        arg_list = api.normal_arg_list if row[1] == "normal" else api.kwonly_arg_list
+        arg_list.append(convert_argument(row[2:]))
+    return apis
+
+
+def get_all_apis(conn: Connection, fields: list[str] | None = None) -> list[API]:
     """
     Get all APIs from the SQLite database.
 
     Args:
         conn (Connection): The SQLite database connection.
+        fields (list[str] | None): The fields of the APIs to load, all of them by default.
+            The other fields keep their default values, e.g. loading only
+            `["full_name", "num_normal_arg", "num_kwonly_arg"]` neither reads the source
+            and the doc nor the argument table.
 
     Returns:
         list[API]: A list of all APIs.
     """
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM api")
-    rows = cur.fetchall()
-    apis = [convert_API(row) for row in rows]
-    return apis
+    return _query_apis(conn, fields)
 
 
-def query_api_by_full_name(conn: Connection, full_name: str) -> API | None:
+def query_api_by_full_name(
+    conn: Connection, full_name: str, fields: list[str] | None = None
+) -> API | None:
     """
     Query an API by its full name from the SQLite database.
 
     Args:
         conn (Connection): The SQLite database connection.
         full_name (str): The full name of the API.
+        fields (list[str] | None): The fields of the API to load, all of them by default.
 
     Returns:
         API: The API object.
     """
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM api WHERE full_name=?", (full_name,))
-    row = cur.fetchone()
-    if row is None:
-        return None
-    return convert_API(row)
+    apis = _query_apis(conn, fields, "WHERE full_name = ?", (full_name,))
+    return apis[0] if apis else None
+
+
+def iter_apis(
+    conn: Connection, fields: list[str] | None = None, chunk_size: int = DATABASE.chunk_size
+) -> Iterator[API]:
+    """
+    Iterate over all APIs sorted by full name, loading `chunk_size` of them at a time.
+
+    Each chunk is a separate query starting after the last full name of the previous one,
+    so no statement stays open between the chunks and the memory doesn't grow with the
+    number of APIs.
+
+    Args:
+        conn (Connection): The SQLite database connection.
+        fields (list[str] | None): The fields of the APIs to load, see `get_all_apis`.
+        chunk_size (int): The number of APIs loaded at a time.
+
+    Yields:
+        API: The APIs.
+    """
+    last = ""
+    while True:
+        apis = _query_apis(
+            conn,
+            fields,
+            "WHERE full_name > ? ORDER BY full_name LIMIT ?",
+            (last, chunk_size),
+        )
+        yield from apis
+        if len(apis) < chunk_size:
+            return
+        last = apis[-1].full_name
 
 
 def query_api_call_by_full_name(conn: Connection, full_name: str) -> list[str]:
@@ -135,46 +525,63 @@ def get_all_api_cals(conn: Connection) -> list[str]:
     return rows
 
 
-def insert_into_api_call(conn: Connection, full_name: str, api_call: str):
+def iter_api_calls(
+    conn: Connection, after_rowid: int = 0, chunk_size: int = DATABASE.chunk_size
+) -> Iterator[tuple[int, str, str]]:
+    """
+    Iterate over the API calls in insertion order, loading `chunk_size` of them at a time.
+
+    Each chunk is a separate query starting after the last rowid of the previous one, so
+    the iteration can be resumed from the rowid of any API call.
+
+    Args:
+        conn (Connection): The SQLite database connection.
+        after_rowid (int): Start after the API call with this rowid.
+        chunk_size (int): The number of API calls loaded at a time.
+
+    Yields:
+        tuple[int, str, str]: `(rowid, full_name, api_call)` rows.
+    """
     cur = conn.cursor()
-    cur.execute("INSERT INTO api_call VALUES (?, ?)", (full_name, api_call))
-    conn.commit()
+    while True:
+        cur.execute(
+            "SELECT rowid, full_name, api_call FROM api_call WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (after_rowid, chunk_size),
+        )
+        rows = cur.fetchall()
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        after_rowid = rows[-1][0]
+
+
+def count_api_calls(conn: Connection) -> dict[str, int]:
+    """
+    Count the API calls of each API.
 
+    Args:
+        conn (Connection): The SQLite database connection.
 
-def init_fuzz():
-    if not FUZZFILE_PATH.exists():
-        FUZZFILE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(FUZZFILE_PATH)
+    Returns:
+        dict[str, int]: The number of API calls of each API, by full name.
+    """
     cur = conn.cursor()
-    cur.execute("CREATE TABLE IF NOT EXISTS fuzz(status)")
-    cur.execute("DELETE FROM fuzz")
-    cur.execute("INSERT INTO fuzz VALUES (?)", (0,))
-    conn.commit()
+    cur.execute("SELECT full_name, COUNT(*) FROM api_call GROUP BY full_name")
+    return dict(cur.fetchall())
 
 
-def start_fuzz():
-    conn = sqlite3.connect(FUZZFILE_PATH)
+def insert_into_api_call(conn: Connection, full_name: str, api_call: str):
     cur = conn.cursor()
-    cur.execute("UPDATE fuzz SET status = 1 WHERE status = 0")
+    cur.execute("INSERT OR IGNORE INTO api_call VALUES (?, ?)", (full_name, api_call))
     conn.commit()
-    conn.close()
 
 
-def can_fuzz(full_name: str) -> bool:
-    conn = sqlite3.connect(FUZZFILE_PATH)
-    cur = conn.cursor()
-    res = cur.execute("SELECT status FROM fuzz")
-    if res.fetchone()[0] == 0:
-        conn.close()
-        return False
-    else:
-        res = cur.execute("SELECT full_name FROM fuzzed WHERE full_name = ?", (full_name,))
-        if res.fetchone() is None:
-            conn.close()
-            return True
-        else:
-            conn.close()
-            return False
+def insert_many_into_api_call(conn: Connection, rows: list[tuple[str, str]]) -> None:
+    """
+    Insert the `(full_name, api_call)` rows in a single transaction.
+    """
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO api_call VALUES (?, ?)", rows)
 
 
 def get_fuzzed(conn: Connection):
@@ -184,7 +591,73 @@ def get_fuzzed(conn: Connection):
     return rows
 
 
-def add_fuzz_record(conn: Connection, date: int, exec_num: int, time_cost: int, py_cov: int = 0):
+def add_fuzz_record(
+    conn: Connection,
+    date: int,
+    exec_num: int,
+    time_cost: int,
+    py_cov: int = 0,
+    restart_num: int = 0,
+    restart_cost: float = 0,
+    startup_cost: float = 0,
+):
+    """
+    Record one fuzzing campaign.
+
+    Args:
+        conn (Connection): The SQLite database connection.
+        date (int): The timestamp when the campaign finished.
+        exec_num (int): The number of executions.
+        time_cost (int): The total time of the campaign in seconds.
+        py_cov (int): The final python coverage.
+        restart_num (int): The number of times the worker was restarted after a timeout.
+        restart_cost (float): The total time in seconds spent restarting the worker.
+        startup_cost (float): The time in seconds to import and instrument the library once,
+            i.e. what each restart used to cost before the fork server.
+    """
     cur = conn.cursor()
-    cur.execute("INSERT INTO fuzz_record VALUES (?, ?, ?, ?)", (date, exec_num, time_cost, py_cov))
+    cur.execute(
+        "INSERT INTO fuzz_record (date, exec_num, time_cost, py_cov, restart_num, restart_cost, startup_cost) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (date, exec_num, time_cost, py_cov, restart_num, restart_cost, startup_cost),
+    )
     conn.commit()
+
+
+def get_api_fuzz_stats(conn: Connection, since: int, limit: int = 10) -> list[tuple]:
+    """
+    Get the APIs which took the most time since a given date.
+
+    Args:
+        conn (Connection): The SQLite database connection.
+        since (int): The timestamp from which the statistics are summed up.
+        limit (int): The number of APIs to return.
+
+    Returns:
+        list[tuple]: `(full_name, exec_num, cov_gain, time_cost, timeout_num, max_latency)`
+            rows sorted by time cost.
+    """
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT full_name, SUM(exec_num), SUM(cov_gain), SUM(time_cost), SUM(timeout_num), "
+        "MAX(max_latency) FROM api_fuzz_stat "
+        "WHERE date >= ? GROUP BY full_name ORDER BY SUM(time_cost) DESC LIMIT ?",
+        (since, limit),
+    )
+    return cur.fetchall()
+
+
+def get_api_time_costs(conn: Connection) -> dict[str, float]:
+    """
+    Get the mean time it took to fuzz each API in the previous campaigns, including the
+    executions interrupted by the watchdog.
+
+    Args:
+        conn (Connection): The SQLite database connection.
+
+    Returns:
+        dict[str, float]: The time cost in seconds of each API fuzzed before.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT full_name, AVG(time_cost) FROM api_fuzz_stat GROUP BY full_name")
+    return dict(cur.fetchall())
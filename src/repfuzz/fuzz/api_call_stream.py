@@ -0,0 +1,72 @@
+import ctypes
+import os
+from multiprocessing import RawValue
+from typing import Iterator
+
+from repfuzz.config import DATABASE
+from repfuzz.database.sqlite_proxy import get_or_create_db, iter_api_calls
+
+
+class ApiCallStream:
+    """
+    The API calls of a shard, read from the database of the library `chunk_size` at a
+    time instead of being copied into a `multiprocessing.Queue` up front.
+
+    It has the part of the `multiprocessing.Queue` interface used by the fuzzer, so a
+    shard can be fed by either of them.
+
+    The rowid of the last API call taken and the number of API calls taken are shared
+    with the parent process, so a worker forked after a timeout resumes right after the
+    API call that timed out, and the parent knows whether any API call is left.
+    """
+
+    def __init__(
+        self,
+        db_name: str,
+        full_names: set[str],
+        total: int,
+        chunk_size: int = DATABASE.chunk_size,
+    ) -> None:
+        """
+        Args:
+            db_name (str): The name of the database of the library.
+            full_names (set[str]): The APIs whose calls belong to the shard.
+            total (int): The number of API calls of these APIs.
+            chunk_size (int): The number of API calls read at a time.
+        """
+        self.db_name = db_name
+        self.full_names = full_names
+        self.total = total
+        self.chunk_size = chunk_size
+        self._last_rowid = RawValue(ctypes.c_int64, 0)
+        self._taken = RawValue(ctypes.c_int64, 0)
+        self._pid = None
+        self._rows: Iterator[tuple[int, str, str]] = iter(())
+
+    def empty(self) -> bool:
+        return self._taken.value >= self.total
+
+    def qsize(self) -> int:
+        return self.total - self._taken.value
+
+    def get(self) -> tuple[str, str]:
+        """
+        Take the next `(full_name, api_call)` of the shard.
+
+        Raises:
+            IndexError: If the shard has no API call left.
+        """
+        if self._pid != os.getpid():  # a new worker resumes where the last one stopped.
+            self._pid = os.getpid()
+            conn = get_or_create_db(self.db_name)
+            self._rows = iter_api_calls(conn, self._last_rowid.value, self.chunk_size)
+        for rowid, full_name, api_call in self._rows:
+            if full_name in self.full_names:
+                self._last_rowid.value = rowid
+                self._taken.value += 1
+                return full_name, api_call
+        self._taken.value = self.total
+        raise IndexError("No API call left in the shard")
+
+    def cancel_join_thread(self) -> None:
+        pass  # no feeder thread to join
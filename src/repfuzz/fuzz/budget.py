@@ -0,0 +1,65 @@
+import ctypes
+import time
+from multiprocessing.sharedctypes import RawValue
+
+from attrs import define, field
+
+from repfuzz.fuzz.heartbeat import Heartbeat
+
+
+@define
+class ApiBudget:
+    """
+    The number of executions allocated to one API.
+
+    An API starts with `base` executions. Each time it finds new coverage, its budget is
+    extended to `base` executions after the current one, up to `limit` executions in total,
+    and it is cut off once it has not found new coverage for `plateau` executions.
+    """
+
+    base: int
+    limit: int
+    plateau: int
+    execs: int = 0
+    last_new_cov: int = 0
+    budget: int = field()
+
+    @budget.default
+    def _budget_default(self) -> int:
+        return min(self.base, self.limit)
+
+    def spend(self, new_cov: int) -> None:
+        self.execs += 1
+        if new_cov > 0:
+            self.last_new_cov = self.execs
+            self.budget = min(self.limit, max(self.budget, self.execs + self.base))
+
+    def exhausted(self) -> bool:
+        return self.execs >= self.budget or self.execs - self.last_new_cov >= self.plateau
+
+
+class LibraryBudget:
+    """
+    The time and execution budget of a library, shared by all its workers.
+
+    The executions are counted by the heartbeats of the workers, None means unlimited.
+    """
+
+    def __init__(
+        self, heartbeats: list[Heartbeat], time_budget: float | None, exec_budget: int | None
+    ) -> None:
+        self.heartbeats = heartbeats
+        self.time_budget = time_budget
+        self.exec_budget = exec_budget
+        self._deadline = RawValue(ctypes.c_double, float("inf"))
+
+    def start(self) -> None:
+        if self.time_budget is not None:
+            self._deadline.value = time.monotonic() + self.time_budget
+
+    def exhausted(self) -> bool:
+        if time.monotonic() > self._deadline.value:
+            return True
+        if self.exec_budget is not None:
+            return sum(hb.exec_num for hb in self.heartbeats) >= self.exec_budget
+        return False
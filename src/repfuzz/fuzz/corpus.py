@@ -0,0 +1,64 @@
+import random
+
+from attrs import define, field
+
+
+@define
+class Seed:
+    param_list: list
+    gain: int = 0  # the coverage increase when the seed was found
+    picks: int = 0  # how many times the seed has been chosen
+    hits: int = 0  # how many of its mutants have increased the coverage
+
+    def weight(self) -> float:
+        """
+        Productive seeds and seeds that have rarely been chosen are preferred.
+        """
+        return (1 + self.gain + self.hits) / (1 + self.picks)
+
+
+@define
+class Corpus:
+    """
+    The population of argument lists of an API.
+
+    The initial argument list is always kept, mutants that increase the coverage are added
+    until `pop_size` seeds are kept, then they replace the seed with the lowest weight.
+    """
+
+    pop_size: int
+    iters_per_seed: int
+    seeds: list[Seed] = field(factory=list)
+
+    @classmethod
+    def from_param_list(cls, param_list: list, pop_size: int, iters_per_seed: int) -> "Corpus":
+        corpus = cls(pop_size, iters_per_seed)
+        corpus.seeds.append(Seed(param_list))
+        return corpus
+
+    def __len__(self) -> int:
+        return len(self.seeds)
+
+    def choose(self) -> Seed:
+        seed = random.choices(self.seeds, weights=[seed.weight() for seed in self.seeds])[0]
+        seed.picks += 1
+        return seed
+
+    def energy(self, seed: Seed) -> int:
+        """
+        The number of mutants to generate from `seed` when it is chosen, AFL-style: a seed
+        gets twice the energy for each of its mutants that increased the coverage, and its
+        energy decays with the times it has been chosen without being productive.
+        """
+        energy = self.iters_per_seed * 2 ** min(seed.hits, 4) / max(1, seed.picks - seed.hits)
+        return max(1, min(int(energy), 4 * self.iters_per_seed))
+
+    def add(self, param_list: list, gain: int, parent: Seed) -> None:
+        parent.hits += 1
+        new_seed = Seed(param_list, gain=gain)
+        if len(self.seeds) < self.pop_size:
+            self.seeds.append(new_seed)
+            return
+        idx = min(range(1, len(self.seeds)), key=lambda i: self.seeds[i].weight(), default=None)
+        if idx is not None and self.seeds[idx].weight() < new_seed.weight():
+            self.seeds[idx] = new_seed
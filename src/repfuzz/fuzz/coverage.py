@@ -0,0 +1,38 @@
+import dcov
+
+
+class CoverageCounter:
+    """
+    Count the edges newly covered in the dcov bitmap since the last checkpoint.
+
+    Each check counts the whole bitmap once, and its count is the checkpoint of the next
+    check. So checking an execution costs one count instead of the two of counting
+    before and after it, when the executions run back-to-back.
+    """
+
+    def __init__(self) -> None:
+        self.count = dcov.count_bitmap_py()
+
+    def checkpoint(self) -> int:
+        """
+        Forget the coverage gained since the last checkpoint, e.g. by code which should
+        not be credited to the next execution.
+
+        Returns:
+            int: The number of covered edges.
+        """
+        self.count = dcov.count_bitmap_py()
+        return self.count
+
+    def new_since_checkpoint(self) -> int:
+        """
+        Get the number of edges covered since the last checkpoint, and move the
+        checkpoint to now.
+
+        Returns:
+            int: The number of newly covered edges.
+        """
+        count = dcov.count_bitmap_py()
+        new = count - self.count
+        self.count = count
+        return new
@@ -1,82 +1,216 @@
+import ctypes
+import os
 import signal
 import threading
+import time
+import weakref
 from typing import Callable
 
+from attrs import define
 
-def watchT(timeout_seconds: float, timeout_handler: Callable, error_handler: Callable):
+
+class ExecutionTimeout(BaseException):
+    """
+    Raised in the main thread of a worker when an execution passes its deadline. It is not
+    an `Exception`, so the `except Exception` clauses of the library don't swallow it.
     """
-    Decorator that watch the execution of the decorated function.
 
-    Args:
-      timeout_seconds (int): The timeout in seconds to be applied to the decorated function.
-      timeout_handler (Callable): A function that handles the timeout.
-      error_handler (Callable): A function that handles the other errors.
+
+class Watchdog:
+    """
+    The watchdog of the executions of a worker, a single long-lived thread started by the
+    first execution of each process, which escalates when an execution passes its deadline:
+
+    1. after `timeout` seconds, SIGALRM is sent to the main thread, whose handler raises
+       `ExecutionTimeout`. It interrupts pure Python code and the blocking system calls,
+       e.g. a `time.sleep` or a read from a socket;
+    2. `grace` seconds later, e.g. if the library has swallowed the exception or replaced
+       the handler, `ExecutionTimeout` is set as an async exception of the main thread;
+    3. `grace` seconds later again, the worker is left to its parent, which kills it once
+       the heartbeat armed with `kill_timeout` expires. A C extension holding the GIL can
+       only be stopped this way, the watchdog thread can't even run meanwhile.
+
+    An execution only swaps the state of the watchdog, no thread is started and no lock is
+    taken unless it times out. The executions may be nested, e.g. an API fuzzing another
+    instrumented API it calls, each one gets its own deadline. Only the executions of the
+    main thread are watched.
     """
 
-    def wrap(func):
-        def to_do(*args, **kwargs):
-            def run():
-                func(*args, **kwargs)
+    def __init__(self, timeout: float, grace: float) -> None:
+        self.timeout = timeout
+        self.grace = grace
+        # (generation, deadline, depth), the generation is bumped when an execution starts
+        # or ends, so the thread can tell whether it is still the execution it waited for.
+        self._exec = (0, 0.0, 0)
+        self._fired = -1  # the generation the watchdog has escalated
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._main_ident = None  # None until the watchdog is started in the process
+        _watchdogs.add(self)
+
+    @property
+    def kill_timeout(self) -> float:
+        return self.timeout + 2 * self.grace
+
+    def _start(self) -> None:
+        self._main_ident = threading.main_thread().ident
+        self._exec = (0, 0.0, 0)
+        self._fired = -1
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        signal.signal(signal.SIGALRM, _handle_signal)
+        threading.Thread(target=self._watch, name="watchdog", daemon=True).start()
+
+    def _handle_signal(self, signum, frame) -> None:
+        if self._exec[0] == self._fired:  # not a late signal of a finished execution
+            raise ExecutionTimeout
+
+    def _set_async_exc(self, exc: type[BaseException] | None) -> None:
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(
+            ctypes.c_ulong(self._main_ident), ctypes.py_object(exc) if exc else None
+        )
+
+    def _watch(self) -> None:
+        while True:
+            gen, deadline, depth = self._exec
+            if depth == 0:
+                self._wakeup.clear()
+                if self._exec[2] == 0:  # an execution may have started before the clear
+                    self._wakeup.wait()
+                continue
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+                continue
+            if gen == self._fired:  # already escalated, the parent kills the worker
+                time.sleep(0.01)
+                continue
+            self._escalate(gen)
+
+    def _wait_end(self, gen: int, seconds: float) -> bool:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if self._exec[0] != gen:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def _escalate(self, gen: int) -> None:
+        self._fired = gen
+        signal.pthread_kill(self._main_ident, signal.SIGALRM)
+        if self._wait_end(gen, self.grace):
+            return
+        with self._lock:  # `end` clears the exception if the execution ends meanwhile
+            if self._exec[0] == gen:
+                self._set_async_exc(ExecutionTimeout)
+        self._wait_end(gen, self.grace)
+
+    def _end(self, depth: int) -> None:
+        # idempotent, it may be interrupted by the ExecutionTimeout and called again.
+        gen = self._exec[0]
+        deadline = time.monotonic() + self.timeout if depth > 1 else 0.0  # for the outer one
+        self._exec = (gen + 1, deadline, depth - 1)
+        if self._fired == gen:
+            with self._lock:
+                self._set_async_exc(None)
+
+    def run(self, func: Callable, *args, **kwargs) -> bool:
+        """
+        Call `func` under the watchdog. The exceptions raised by `func` are propagated.
+
+        Returns:
+            bool: Whether `func` has finished before its deadline.
+        """
+        if self._main_ident is None and threading.current_thread() is threading.main_thread():
+            self._start()
+        if threading.get_ident() != self._main_ident:
+            func(*args, **kwargs)
+            return True
+        depth = self._exec[2] + 1
+        finished = True
+        try:
+            self._exec = (self._exec[0] + 1, time.monotonic() + self.timeout, depth)
+            if not self._wakeup.is_set():
+                self._wakeup.set()
+            func(*args, **kwargs)
+        except ExecutionTimeout:
+            finished = False
+        finally:
+            while True:
+                try:
+                    self._end(depth)
+                    break
+                except ExecutionTimeout:  # raised late, e.g. by the async exception
+                    finished = False
+        return finished
+
+
+_watchdogs: weakref.WeakSet = weakref.WeakSet()
+
+
+def _handle_signal(signum, frame) -> None:
+    # the handler is shared by the watchdogs of the process, e.g. the nested `watch`es.
+    for watchdog in list(_watchdogs):
+        if watchdog._main_ident is not None:
+            watchdog._handle_signal(signum, frame)
+
+
+def _reset_watchdogs() -> None:
+    # the thread of the parent doesn't survive a fork, each worker starts its own.
+    for watchdog in _watchdogs:
+        watchdog._main_ident = None
+
+
+os.register_at_fork(after_in_child=_reset_watchdogs)
+
+
+@define
+class LatencyStats:
+    """
+    The latency of the executions of an API in a worker.
+    """
 
-            t = threading.Thread(target=run)
-            try:
-                t.start()
-                t.join(timeout_seconds)
-                if t.is_alive():
-                    timeout_handler(
-                        TimeoutError(f"Execution takes more than {timeout_seconds:.2f} seconds")
-                    )
-            except Exception as e:
-                error_handler(e)
+    exec_num: int = 0
+    timeout_num: int = 0
+    total: float = 0.0
+    max: float = 0.0
 
-        return to_do
+    def add(self, latency: float, finished: bool) -> None:
+        self.exec_num += 1
+        self.total += latency
+        if latency > self.max:
+            self.max = latency
+        if not finished:
+            self.timeout_num += 1
 
-    return wrap
+    @property
+    def mean(self) -> float:
+        return self.total / self.exec_num if self.exec_num else 0.0
 
 
-def watchS(timeout_seconds: float, timeout_handler: Callable, error_handler: Callable):
+def watch(timeout_seconds: float, timeout_handler: Callable, error_handler: Callable):
     """
-    Decorator that watch the execution of the decorated function.
+    Decorator that watch the execution of the decorated function with a `Watchdog`.
 
     Args:
-      timeout_seconds (int): The timeout in seconds to be applied to the decorated function.
+      timeout_seconds (float): The timeout in seconds to be applied to the decorated function.
       timeout_handler (Callable): A function that handles the timeout.
       error_handler (Callable): A function that handles the other errors.
     """
-
-    def handle_timeout(signum, frame):
-        raise TimeoutError(f"Execution takes more than {timeout_seconds:.2f} seconds")
+    watchdog = Watchdog(timeout_seconds, timeout_seconds)
 
     def wrap(func):
         def to_do(*args, **kwargs):
-            signal.signal(signal.SIGALRM, handle_timeout)
             try:
-                signal.setitimer(signal.ITIMER_REAL, timeout_seconds)
-                func(*args, **kwargs)
-                signal.setitimer(signal.ITIMER_REAL, 0)
-            except TimeoutError as e:
-                signal.setitimer(signal.ITIMER_REAL, 0)
-                timeout_handler(e)
+                finished = watchdog.run(func, *args, **kwargs)
             except Exception as e:
-                signal.setitimer(signal.ITIMER_REAL, 0)
                 error_handler(e)
+                return
+            if not finished:
+                timeout_handler(
+                    TimeoutError(f"Execution takes more than {timeout_seconds:.2f} seconds")
+                )
 
         return to_do
 
     return wrap
-
-
-def watchE(error_handler: Callable):
-    def wrap(func):
-        def to_do(*args, **kwargs):
-            try:
-                func(*args, **kwargs)
-            except Exception as e:
-                error_handler(e)
-
-        return to_do
-
-    return wrap
-
-
-watch = watchE
@@ -1,23 +1,31 @@
 import os
 import random
 import sys
-from multiprocessing.connection import Connection
+import time
 from typing import Callable
 
 import tqdm
 from loguru import logger
-import dcov
 from colorama import Fore
 
 from repfuzz.config import FUZZ
-from repfuzz.database.sqlite_proxy import get_or_create_db, insert_into_fuzzed_api
-from repfuzz.fuzz.execution_watcher import watch
-from repfuzz.mutator import mutate_param_list
-from repfuzz.tools.custom_obj_str import objjson
+from repfuzz.database.campaign import DONE, FUZZING, TIMEOUT, Campaign
+from repfuzz.database.sqlite_proxy import get_api_fuzz_stat_writer, get_fuzzed_api_writer
+from repfuzz.fuzz.budget import ApiBudget, LibraryBudget
+from repfuzz.fuzz.corpus import Corpus
+from repfuzz.fuzz.coverage import CoverageCounter
+from repfuzz.fuzz.execution_watcher import LatencyStats, Watchdog
+from repfuzz.fuzz.heartbeat import Heartbeat
+from repfuzz.fuzz.repro import ReproBuffer
+from repfuzz.mutator import copy_param_list, mutate_param_list
 
 current_api = ""
-c_conn: Connection = None
+heartbeat: Heartbeat = None
+repro: ReproBuffer = None
+budget: LibraryBudget = None
+campaign: Campaign = None
 black_set = set()
+watchdog = Watchdog(FUZZ.exec_timeout, FUZZ.exec_timeout_grace)
 
 
 def handle_error(error: Exception):
@@ -29,20 +37,29 @@ def handle_error(error: Exception):
     pass
 
 
-@watch(error_handler=handle_error)
-def execute_once(api: Callable, *args, **kwargs):
+def execute_once(api: Callable, *args, **kwargs) -> bool:
     """
-    Execute the API with the given arguments.
+    Execute the API with the given arguments under the watchdog of the worker.
 
     This function watches for errors, such as crashes, and handles them according
-    to the `handle_error` function.
+    to the `handle_error` function. The heartbeat is armed with the kill timeout of the
+    watchdog, so the parent kills the worker soon if the watchdog can't interrupt the
+    execution, e.g. in a C extension holding the GIL.
 
     Args:
         api: The API to be executed.
         *args: Variable number of positional arguments to be passed to the API.
         **kwargs: Variable number of keyword arguments to be passed to the API.
+
+    Returns:
+        bool: Whether the execution has finished within `FUZZ.exec_timeout`.
     """
-    api(*args, **kwargs)
+    heartbeat.arm(watchdog.kill_timeout)
+    try:
+        return watchdog.run(api, *args, **kwargs)
+    except Exception as e:
+        handle_error(e)
+        return True
 
 
 def convert_to_param_list(*args, **kwargs) -> list:
@@ -60,10 +77,15 @@ def fuzz_api(api: Callable, *args, **kwargs) -> None:
     """
     Fuzz a given api with random mutants and argument permutations.
 
+    The api may be a function, a method whose first argument is the receiver, or a class
+    whose constructor is fuzzed.
+
     This function executes the provided function with a set of random inputs,
     incrementally increasing the mutation rate to improve code coverage.
     If the function has no arguments, it executes only once.
-    If the function has been previously fuzzed and timed out, it is skipped.
+    If the function has been fuzzed in this campaign, or has been previously fuzzed and
+    timed out, it is skipped. The fuzzing stops once `FUZZ.max_timeouts_per_api`
+    executions have been interrupted by the watchdog.
 
     Args:
         api: The function to be fuzzed.
@@ -73,30 +95,47 @@ def fuzz_api(api: Callable, *args, **kwargs) -> None:
     Returns:
         None
     """
-    full_name = f"{api.__module__}.{api.__name__}"
+    full_name = f"{api.__module__}.{api.__qualname__}"  # e.g. pandas.core.frame.DataFrame.head
     top_mod_name = api.__module__.split(".")[0]
-    conn = get_or_create_db(top_mod_name)
-    insert_into_fuzzed_api(conn, full_name)
+    get_fuzzed_api_writer(top_mod_name).add((full_name,))
 
+    if not campaign.can_fuzz(full_name):
+        return
     if full_name in black_set:
         logger.info(
             f"Skip {full_name} as it has always been timed out."
         )
         return
+    if budget.exhausted():
+        return
 
+    campaign.set_api_status(full_name, FUZZING)
+    outer_api = current_api.value  # e.g. an API whose mutant calls this one
+    current_api.value = full_name  # the parent records it as timed out if the worker hangs.
+    heartbeat.new_api()
+    repro.begin_api()
     param_list = convert_to_param_list(*args, **kwargs)  # convert args and kwargs to list.
     if len(param_list) == 0:
         logger.info(
             f"{full_name} has no arguments, execute only once."
         )
-        c_conn.recv()
-        execute_once(api, *args, **kwargs)
-        c_conn.send(0)
+        t0 = time.time()
+        cov = CoverageCounter()
+        repro.record(api, args, kwargs)
+        finished = execute_once(api, *args, **kwargs)
+        heartbeat.beat()
+        dt = time.time() - t0
+        get_api_fuzz_stat_writer(top_mod_name).add(
+            (int(time.time()), full_name, 1, cov.new_since_checkpoint(), dt, 0, int(not finished), dt)
+        )
+        campaign.set_api_status(full_name, DONE if finished else TIMEOUT)
+        repro.end_api()
+        current_api.value = outer_api
+        get_fuzzed_api_writer(top_mod_name).flush()  # the parent may kill the worker later on
+        get_api_fuzz_stat_writer(top_mod_name).flush()
         return
     
     logger.info(f"Start fuzz {full_name}")
-
-    current_api.value = full_name
     # pbar = tqdm.tqdm(
     #     total=FUZZ.iters_per_api,
     #     bar_format="{l_bar}%s{bar}%s{r_bar}" % (Fore.GREEN, Fore.RESET),
@@ -105,28 +144,67 @@ def fuzz_api(api: Callable, *args, **kwargs) -> None:
     # )
 
     """
-    FUZZ.iters_per_api: The number of mutations for each API.
-    FUZZ.iters_per_seed: The number of mutations for each seed.
-    FUZZ.iters_per_api // FUZZ.iters_per_seed: The number of seeds for each API.
-    Seed is randomly selected from the population `pop`.
+    FUZZ.iters_per_api: The base number of mutations for each API.
+    FUZZ.max_iters_per_api: The maximum number of mutations for an API still finding new coverage.
+    FUZZ.plateau_iters: Stop fuzzing the API after this many mutations without new coverage.
+    FUZZ.iters_per_seed: The base number of mutations each time a seed is chosen.
+    FUZZ.pop_size: The maximum number of seeds for each API.
+    Seed is chosen from the population `corpus` according to its weight, and mutants
+    increasing the coverage are added to the population.
+    The coverage counted after an execution is the checkpoint of the next one, so each
+    execution counts the bitmap once.
+    The latency of the executions is recorded with the statistics of the API, the
+    scheduler of the next campaigns balances the shards with them.
     """
-    for i in range(FUZZ.iters_per_api // FUZZ.iters_per_seed):
-        for j in range(FUZZ.iters_per_seed):  # for each seed, generate multiple mutations.
-            mt_param_list = mutate_param_list(param_list)
+    # the mutants share the arguments they don't mutate with the seeds, not with the caller.
+    param_list = copy_param_list(param_list)
+    corpus = Corpus.from_param_list(param_list, FUZZ.pop_size, FUZZ.iters_per_seed)
+    api_budget = ApiBudget(FUZZ.iters_per_api, FUZZ.max_iters_per_api, FUZZ.plateau_iters)
+    latency = LatencyStats()
+    cov_gain = 0
+    cov = CoverageCounter()
+    t0 = time.time()
+    while not api_budget.exhausted() and not budget.exhausted():
+        seed = corpus.choose()
+        for j in range(corpus.energy(seed)):  # for each seed, generate multiple mutations.
+            mt_param_list = mutate_param_list(seed.param_list)
             args, kwargs = reconvert_param_list(
                 mt_param_list, *args, **kwargs
             )  # convert back to args and kwargs.
-            with open("/tmp/fuzz.py", "w") as f:
-                f.write(f"import {api.__module__}\n")
-                f.write(f"args={objjson(args)}\n")
-                f.write(f"kwargs={objjson(kwargs)}\n")
-                f.write(f"{api.__module__}.{api.__name__}(*args, **kwargs)\n")
-            p0 = dcov.count_bitmap_py()
-            c_conn.recv()  # wait for the signal from the parent
-            execute_once(api, *args, **kwargs)
-            c_conn.send(0)  # signal to the parent that the execution is done.
-            p1 = dcov.count_bitmap_py()
-            if p1 > p0:
-                logger.info(f"Coverage increased {p1-p0}, now: {p1}")
-    #     pbar.update(FUZZ.iters_per_seed)
-    # pbar.close()
\ No newline at end of file
+            repro.record(api, args, kwargs)  # readable by the parent if the execution hangs.
+            t1 = time.perf_counter()
+            finished = execute_once(api, *args, **kwargs)
+            latency.add(time.perf_counter() - t1, finished)
+            heartbeat.beat()  # tell the parent that the execution is done.
+            new_cov = cov.new_since_checkpoint()
+            api_budget.spend(new_cov)
+            if new_cov > 0:
+                logger.info(f"Coverage increased {new_cov}, now: {cov.count}")
+                corpus.add(mt_param_list, new_cov, seed)
+                cov_gain += new_cov
+            if api_budget.exhausted() or latency.timeout_num >= FUZZ.max_timeouts_per_api:
+                break
+        if latency.timeout_num >= FUZZ.max_timeouts_per_api:
+            logger.info(f"Stop fuzzing {full_name} after {latency.timeout_num} timeouts")
+            break
+    dt = time.time() - t0
+    logger.info(
+        f"Fuzz {full_name} done with {api_budget.execs} executions and {len(corpus)} seeds, coverage +{cov_gain}"
+    )
+    get_api_fuzz_stat_writer(top_mod_name).add(
+        (
+            int(time.time()),
+            full_name,
+            api_budget.execs,
+            cov_gain,
+            dt,
+            len(corpus),
+            latency.timeout_num,
+            latency.max,
+        )
+    )
+    campaign.set_api_status(full_name, TIMEOUT if latency.timeout_num else DONE)
+    repro.end_api()
+    current_api.value = outer_api
+    get_fuzzed_api_writer(top_mod_name).flush()  # the parent may kill the worker later on
+    get_api_fuzz_stat_writer(top_mod_name).flush()
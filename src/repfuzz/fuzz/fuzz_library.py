@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import argparse
 import ctypes
 import importlib
@@ -8,48 +10,144 @@ import sys
 import time
 from loguru import logger
 from pathlib import Path
-from collections import defaultdict
 from multiprocessing import Manager, Pipe, Process, Queue
 from multiprocessing.connection import Connection
-import dcov
+from typing import Any
 
+import dcov
+from attrs import define
 from colorama import Fore
 
 from repfuzz.config import FUZZ, blacklist, skip, tgts
+from repfuzz.database.campaign import DONE, FAILED, FUZZING, RUNNING, TIMEOUT, Campaign
 from repfuzz.database.sqlite_proxy import (
     add_fuzz_record,
-    get_all_api_cals,
+    count_api_calls,
+    flush_buffered_writers,
+    get_api_fuzz_stat_writer,
+    get_api_fuzz_stats,
+    get_api_time_costs,
+    get_fuzzed_api_writer,
     get_or_create_db,
-    init_fuzz,
-    start_fuzz,
 )
-from repfuzz.fuzz import fuzz_api
+from repfuzz.fuzz import fuzz_api, static_instrument
+from repfuzz.fuzz.api_call_stream import ApiCallStream
+from repfuzz.fuzz.budget import LibraryBudget
+from repfuzz.fuzz.heartbeat import Heartbeat
+from repfuzz.fuzz.repro import ReproBuffer
 from repfuzz.fuzz.static_instrument import instrument_module
 
 
-def safe_fuzz(
-    library_name: str, queue: Queue, current_api, c_conn: Connection, black_set: set
+@define
+class FuzzStats:
+    exec_num: int = 0
+    restart_num: int = 0
+    restart_cost: float = 0.0
+    startup_cost: float = 0.0
+
+
+@define
+class Shard:
+    """
+    The part of the API calls executed by one worker, with the state the worker shares
+    with the parent process.
+    """
+
+    queue: Queue | ApiCallStream
+    current_api: Any
+    heartbeat: Heartbeat
+    repro: ReproBuffer
+
+
+def safe_fuzz(shard: Shard, budget: LibraryBudget, campaign: Campaign) -> None:
+    """
+    Execute the API calls of `shard` until its queue is empty or the budget of the library
+    is exhausted.
+
+    This function runs in a child forked by `fork_server`, so the library has already
+    been imported and instrumented. If the child is killed due to a timeout, the fork
+    server forks a new child which continues with the rest of the queue.
+
+    Args:
+        shard (Shard): The API calls to execute and the state shared with the parent process.
+        budget (LibraryBudget): The time and execution budget of the library.
+        campaign (Campaign): The campaign the worker belongs to.
+
+    Returns:
+        None
+    """
+    campaign.load_api_status()  # skip the APIs the previous workers of the shard fuzzed.
+    setattr(fuzz_api, "campaign", campaign)
+    setattr(fuzz_api, "current_api", shard.current_api)
+    shard.current_api.value = ""  # not the API the previous worker of the shard was killed in
+    setattr(fuzz_api, "heartbeat", shard.heartbeat)
+    setattr(fuzz_api, "repro", shard.repro)
+    setattr(fuzz_api, "budget", budget)
+    setattr(static_instrument, "fuzzing", True)
+
+    shard.repro.install()
+    shard.heartbeat.arm()
+    while not shard.queue.empty() and not budget.exhausted():
+        try:
+            full_name, api_call = shard.queue.get()
+        except IndexError:  # the API calls were removed from the database meanwhile.
+            break
+        logger.info(f"Execute {full_name}")
+        # Keep the API call for later analysis
+        shard.repro.set_api_call(api_call)
+        exec(api_call)
+
+    flush_buffered_writers()
+    campaign.flush()
+    shard.heartbeat.finish()  # Signal to the parent process that fuzzing is complete.
+
+
+def _reap_children(options: int = os.WNOHANG) -> None:
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, options)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+
+
+def fork_server(
+    library_name: str,
+    shards: list[Shard],
+    budget: LibraryBudget,
+    campaign: Campaign,
+    ctl_conn: Connection,
+    black_set,
 ) -> None:
     """
-    Safely fuzz the given library by executing the fuzzing process in a separate process.
+    An AFL-style fork server for the given library.
+
+    The library is imported under `dcov.LoaderWrapper` and instrumented only once, then a
+    cheap child running `safe_fuzz` is forked every time the parent asks for a (new) worker,
+    so a timeout or a crash only costs a `fork()` instead of a full re-import.
 
-    This function is designed to handle the fuzzing process in a safe manner by:
-    - Instrumenting the library using the `repfuzz.fuzz.static_instrument` module to add fuzzing functionality.
+    The protocol over `ctl_conn` is:
+    - after the library is ready, the fork server sends its startup cost in seconds;
+    - the parent sends the index of a shard to request a new worker for it, and the fork
+      server answers with the pid of the worker;
+    - the parent sends None to shut the fork server down.
 
     Args:
         library_name (str): The name of the library to be fuzzed.
-        queue (Queue): A multiprocessing queue to receive API calls.
-        current_api: The current API being fuzzed.
-        c_conn (Connection): A connection to the parent process for communication.
-        black_set (set): A set of blacklisted API calls.
+        shards (list[Shard]): The shards of API calls, one worker at a time per shard.
+        budget (LibraryBudget): The time and execution budget shared by all the workers.
+        campaign (Campaign): The campaign, whose status is set to FUZZING once the library
+            is ready.
+        ctl_conn (Connection): A connection used by the fork server to talk to the parent process.
+        black_set: A shared set of blacklisted API calls.
 
     Returns:
         None
     """
-    logger.info(f"Fuzzing process started for {library_name}")
+    logger.info(f"Fork server started for {library_name}")
+    t0 = time.time()
 
-    setattr(fuzz_api, "current_api", current_api)
-    setattr(fuzz_api, "c_conn", c_conn)
     setattr(fuzz_api, "black_set", black_set)
 
     spec = importlib.util.find_spec(library_name)
@@ -62,119 +160,320 @@ def safe_fuzz(
         target = importlib.import_module(library_name)
         instrument_module(target)
 
-        init_fuzz()
-        start_fuzz()
+        campaign.set_status(FUZZING)  # the workers inherit the status.
 
-        while not queue.empty():
-            full_name, api_call = queue.get()
-            logger.info(f"Execute {full_name}")
-            # Save the API call to a file for later analysis
-            with open("/tmp/api_call.py", "w") as f:
-                f.write(api_call)
-            exec(api_call)
+        ctl_conn.send(time.time() - t0)
+        while (idx := ctl_conn.recv()) is not None:
+            _reap_children()
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    safe_fuzz(shards[idx], budget, campaign)
+                finally:
+                    os._exit(0)
+            ctl_conn.send(pid)
 
-        c_conn.send(1)  # Signal to the parent process that fuzzing is complete.
+    _reap_children(0)
 
 
-def fuzz_one_library(library_name: str) -> None:
+def record_killed_api(library_name: str, full_name: str, heartbeat: Heartbeat) -> None:
     """
-    The main entry point for the fuzzing process. One library is fuzzed at a time.
+    Record the statistics of an API whose worker has been killed, so the scheduler of the
+    next campaigns knows how long it takes. The coverage it has gained is unknown.
+    """
+    get_api_fuzz_stat_writer(library_name).add(
+        (
+            int(time.time()),
+            full_name,
+            heartbeat.api_exec_num + 1,  # including the execution it was killed in
+            0,
+            heartbeat.api_time,
+            0,
+            1,
+            heartbeat.exec_time,
+        )
+    )
 
-    This function initializes the database, sets up the queue, and starts the safe fuzzing process.
+
+def save_potential_bug(repro: ReproBuffer) -> None:
+    """
+    Save the triggering code and the corresponding API call of a timeout to `FUZZ.potential_bugs`.
 
     Args:
-        library_name (str): The name of the library to be fuzzed.
+        repro (ReproBuffer): The reproduction data of the worker which timed out.
+    """
+    api_call, triggering_code = repro.read()
+    if not triggering_code:
+        triggering_code = "# The worker was not executing a mutant, the API call itself timed out\n"
+    save_dir = FUZZ.potential_bugs
+    save_dir.mkdir(parents=True, exist_ok=True)
+    filelist = os.listdir(save_dir)
+    idx = len(filelist) + 1
+    filepath = save_dir.joinpath(f"{idx}.py")
+    with open(filepath, "w") as f:
+        f.write("# Corresponding API call\n")
+        f.write(api_call)
+        f.write("\n# Triggering Code\n")
+        f.write(triggering_code)
+
+
+def shard_api_calls(
+    counts: dict[str, int], jobs: int, costs: dict[str, float] | None = None
+) -> list[dict[str, int]]:
+    """
+    Split the API calls into `jobs` shards taking about the same time.
+
+    All the API calls to the same API go to the same shard, since an API is fuzzed only
+    once per worker. The APIs are weighted by the time it took to fuzz them in the previous
+    campaigns, and the APIs never fuzzed by the mean of these times, so the slow APIs, e.g.
+    the ones timing out, are spread over the shards. Without any statistics, the APIs are
+    weighted by their number of API calls.
+
+    Args:
+        counts (dict[str, int]): The number of API calls of each API.
+        jobs (int): The number of shards.
+        costs (dict[str, float] | None): The time cost of the APIs fuzzed before.
 
     Returns:
-        None
+        list[dict[str, int]]: The number of API calls of the APIs of each shard.
+
+    Raises:
+        ValueError: If `jobs` is less than 1.
     """
-    conn = get_or_create_db(library_name)
-    total_rows = get_all_api_cals(conn)
+    if jobs < 1:
+        raise ValueError(f"The number of jobs must be at least 1, got {jobs}")
+    weights: dict[str, float] = dict(counts)
+    if costs:
+        mean_cost = sum(costs.values()) / len(costs)
+        weights = {full_name: costs.get(full_name, mean_cost) for full_name in counts}
+    shards = [{} for _ in range(jobs)]
+    sizes = [0.0] * jobs
+    for full_name, weight in sorted(weights.items(), key=lambda x: x[1], reverse=True):
+        idx = sizes.index(min(sizes))
+        shards[idx][full_name] = counts[full_name]
+        sizes[idx] += weight
+    return shards
+
+
+def fuzz_queues(library_name: str, queues: list[Queue | ApiCallStream]) -> FuzzStats:
+    """
+    Fuzz all the API calls in `queues` with a fork server of the given library.
 
-    queue = Queue()
+    Each queue is executed by its own worker, so the queues are fuzzed in parallel and
+    a timeout in one of them only restarts its own worker. All the workers write their
+    coverage into the same dcov bitmap.
 
-    # Populate the queue with API calls that are not in the blacklist.
-    for full_name, api_call in total_rows:
-        if full_name in blacklist.get(library_name, []):
-            continue
-        queue.put((full_name, api_call))
+    Args:
+        library_name (str): The name of the library to be fuzzed.
+        queues (list[Queue | ApiCallStream]): Multiprocessing queues filled with
+            `(full_name, api_call)`, or the streams of these API calls.
 
-    logger.info(
-        f"There are {len(total_rows)} api calls for {library_name} to fuzz."
-    )
+    Returns:
+        FuzzStats: The number of executions and the restart costs.
+    """
+    stats = FuzzStats()
 
     # create some shared memory structures for inter-process communication.
-    exec_counter = 0
-    exec_status = defaultdict(int)
     manager = Manager()
-    current_api = manager.Value(ctypes.c_char_p, "")
-    black_set = set()
-    p_conn, c_conn = Pipe()
+    shards = [
+        Shard(
+            queue,
+            manager.Value(ctypes.c_char_p, ""),
+            Heartbeat(FUZZ.stall_timeout),
+            ReproBuffer(
+                FUZZ.repro_size,
+                FUZZ.repro_api_call_capacity,
+                FUZZ.repro_capacity,
+                FUZZ.repro_record_capacity,
+            ),
+        )
+        for queue in queues
+    ]
+    black_set = manager.dict()
+    budget = LibraryBudget([shard.heartbeat for shard in shards], FUZZ.time_budget, FUZZ.exec_budget)
+    campaign = Campaign.create(library_name, len(shards))
+    logger.info(f"Campaign {campaign.run_id} of {library_name} started")
+    ctl_p_conn, ctl_c_conn = Pipe()
+
+    server = Process(
+        target=fork_server,
+        args=(library_name, shards, budget, campaign, ctl_c_conn, black_set),
+    )
+    server.start()
+    ctl_c_conn.close()  # Only the fork server writes to this end.
+
+    try:
+        stats.startup_cost = ctl_p_conn.recv()
+    except EOFError:
+        logger.error(f"Fork server for {library_name} failed to start")
+        campaign.set_status(FAILED)
+        server.join()
+        return stats
+    logger.info(f"Importing and instrumenting {library_name} takes {stats.startup_cost:.2f}s")
+    budget.start()  # the startup cost is not charged to the budget.
+
+    def start_worker(idx: int) -> int:
+        # Ask the fork server for a new worker process to execute the API calls of a shard.
+        shards[idx].heartbeat.reset()
+        ctl_p_conn.send(idx)
+        pid = ctl_p_conn.recv()
+        campaign.set_worker_status(idx, pid, RUNNING)
+        return pid
+
+    workers: dict[int, int] = {}  # shard index -> worker pid
+    for idx, shard in enumerate(shards):
+        if not shard.queue.empty():
+            workers[idx] = start_worker(idx)
+
+    """
+    The workers run their executions back-to-back and beat after each of them.
+    The watchdog of a worker interrupts the executions slower than `FUZZ.exec_timeout`.
+    The parent only intervenes when a heartbeat stalls, i.e. the watchdog could not
+    interrupt an execution within its kill timeout, or the worker has been stuck outside
+    the executions for `FUZZ.stall_timeout` seconds.
+    """
+    while workers:
+        time.sleep(FUZZ.heartbeat_interval)
+        for idx, worker_pid in list(workers.items()):
+            shard = shards[idx]
+            if shard.heartbeat.done:  # the worker process has finished all the API calls.
+                campaign.set_worker_status(idx, worker_pid, DONE)
+                del workers[idx]
+                continue
+            if not shard.heartbeat.expired():
+                continue
+
+            # the current execution has not finished within the timeout.
+            logger.info(
+                f"\n{Fore.RED}Fuzzing process timeout, restarting...",
+                file=sys.__stderr__,
+            )
+
+            """
+            if the worker process has not finished the current execution within the timeout and
+            the total number of executions for the current API call is less than 10,
+            add the current API call to the black_set and kill the worker process.
+            """
+            full_name = shard.current_api.value  # empty if stuck outside the fuzzed APIs
+            if full_name:
+                campaign.load_api_status()  # it may have been finished meanwhile
+            if full_name and campaign.api_status.get(full_name) != DONE:
+                if shard.heartbeat.api_exec_num < 10:
+                    black_set[full_name] = True
+                # the worker only flushes the APIs it has finished.
+                get_fuzzed_api_writer(library_name).add((full_name,))
+                record_killed_api(library_name, full_name, shard.heartbeat)
+                campaign.set_api_status(full_name, TIMEOUT)
+            campaign.set_worker_status(idx, worker_pid, TIMEOUT)
+            shard.repro.request_dump(worker_pid, FUZZ.repro_timeout)
+            os.kill(worker_pid, 9)
+
+            save_potential_bug(shard.repro)
+
+            if shard.queue.empty() or budget.exhausted():
+                del workers[idx]
+                continue
+            t0 = time.time()
+            workers[idx] = start_worker(idx)
+            stats.restart_num += 1
+            stats.restart_cost += time.time() - t0
+
+    if budget.exhausted():
+        logger.info(f"The budget of {library_name} is exhausted")
+        for shard in shards:
+            shard.queue.cancel_join_thread()  # the rest of the API calls are dropped.
+    logger.info(f"Fuzzing {library_name} done")
+    flush_buffered_writers()
+    campaign.set_status(DONE)
+    stats.exec_num = sum(shard.heartbeat.exec_num for shard in shards)
+    ctl_p_conn.send(None)
+    server.join()
+
+    if stats.restart_num:
+        saved = stats.restart_num * stats.startup_cost - stats.restart_cost
+        logger.info(
+            f"{stats.restart_num} restarts take {stats.restart_cost:.2f}s, {saved:.2f}s saved by the fork server"
+        )
+    return stats
+
+
+def fuzz_one_library(library_name: str, jobs: int = 1) -> None:
+    """
+    The main entry point for the fuzzing process. One library is fuzzed at a time.
+
+    This function initializes the database, shards the API calls, and starts the fork server.
+
+    Args:
+        library_name (str): The name of the library to be fuzzed.
+        jobs (int): The number of workers fuzzing the library in parallel.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: If `jobs` is less than 1.
+    """
+    if jobs < 1:  # before opening the database and the bitmap
+        raise ValueError(f"The number of jobs must be at least 1, got {jobs}")
+    conn = get_or_create_db(library_name)
+    counts = count_api_calls(conn)
+    total = sum(counts.values())
+
+    # The workers stream the API calls of the APIs that are not in the blacklist.
+    for full_name in blacklist.get(library_name, []):
+        counts.pop(full_name, None)
+    queues = [
+        ApiCallStream(library_name, set(shard), sum(shard.values()))
+        for shard in shard_api_calls(counts, jobs, get_api_time_costs(conn))
+    ]
+
+    logger.info(f"There are {total} api calls for {library_name} to fuzz with {jobs} jobs.")
 
     dcov.open_bitmap_py()
     dcov.clear_bitmap_py()
 
     t0 = time.time()
-    while not queue.empty():
-        # Start a new worker process to execute all the API calls.
-        safe_worker = Process(
-            target=safe_fuzz,
-            args=(library_name, queue, current_api, c_conn, black_set),
-        )
-        safe_worker.start()
-
-        while True:
-            p_conn.send(
-                1
-            )  # send a signal to the worker process to allow it to execute the next execution.
-            if p_conn.poll(
-                10
-            ):  # check if the worker process has finished the current execution within the timeout.
-                r = p_conn.recv()
-                if r:  # receive 1 if the worker process has finished all the API calls.
-                    logger.info(f"Fuzzing {library_name} done")
-                    break
-                else:  # receive 0 if the worker process has finished the current execution but not all the API calls.
-                    exec_counter += 1
-                    exec_status[current_api.value] += 1
-            else:  # if the worker process has not finished the current execution within the timeout.
-                logger.info(
-                    f"\n{Fore.RED}Fuzzing process timeout, restarting...",
-                    file=sys.__stderr__,
-                )
-
-                """
-                if the worker process has not finished the current execution within the timeout and
-                the total number of executions for the current API call is less than 10,
-                add the current API call to the black_set and kill the worker process.
-                """
-                if exec_status[current_api.value] < 10:
-                    black_set.add(current_api.value)
-                os.kill(safe_worker.pid, 9)
-
-                # save the triggering code and API call to a file.
-                save_dir = FUZZ.potential_bugs
-                save_dir.mkdir(parents=True, exist_ok=True)
-                filelist = os.listdir(save_dir)
-                idx = len(filelist) + 1
-                filepath = save_dir.joinpath(f"{idx}.py")
-                with open(filepath, "w") as f:
-                    f.write("# Corresponding API call\n")
-                    f.write(open("/tmp/api_call.py", "r").read())
-                    f.write("# Triggering Code\n")
-                    f.write(open("/tmp/fuzz.py", "r").read())
-                break  # break the current fuzzing loop and restart the process.
-        safe_worker.join()
-
+    stats = fuzz_queues(library_name, queues)
     dt = time.time() - t0
-    add_fuzz_record(conn, int(time.time()), exec_counter, dt, dcov.count_bitmap_py())
+    for full_name, exec_num, cov_gain, time_cost, timeout_num, max_latency in get_api_fuzz_stats(
+        conn, int(t0)
+    ):
+        logger.info(
+            f"{full_name}: {exec_num} executions, coverage +{cov_gain}, {time_cost:.2f}s, "
+            f"{timeout_num} timeouts, slowest {max_latency:.3f}s"
+        )
+    add_fuzz_record(
+        conn,
+        int(time.time()),
+        stats.exec_num,
+        dt,
+        dcov.count_bitmap_py(),
+        stats.restart_num,
+        stats.restart_cost,
+        stats.startup_cost,
+    )
     dcov.close_bitmap_py()
 
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
 def main():
     argparser = argparse.ArgumentParser(description="Fuzzing library")
     argparser.add_argument(
         "-l", "--library_name", type=str, help="Library name to be fuzzeded", required=False
     )
+    argparser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        default=1,
+        help="Number of workers fuzzing a library in parallel",
+    )
     args = argparser.parse_args()
 
     fake_stdout = io.StringIO()
@@ -183,13 +482,13 @@ def main():
     sys.stderr = fake_stderr
     if args.library_name:
         library_name = args.library_name
-        fuzz_one_library(library_name)
+        fuzz_one_library(library_name, args.jobs)
     else:
         for target in tgts:
             if target in skip:
                 logger.info(f"skip {target}")
                 continue
-            fuzz_one_library(target)
+            fuzz_one_library(target, args.jobs)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,99 @@
+import ctypes
+import time
+from multiprocessing.sharedctypes import RawArray
+
+_BEATS = 0
+_API_BEATS = 1
+_DEADLINE = 2
+_DONE = 3
+_API_START = 4
+_ARMED = 5
+
+
+class Heartbeat:
+    """
+    A heartbeat shared by a worker and its parent through shared memory.
+
+    The worker runs its executions back-to-back and only bumps a counter after each of
+    them, which also pushes the deadline `timeout` seconds away. The parent never talks
+    to the worker, it only checks whether the deadline has passed, i.e. whether the
+    counter has stalled.
+
+    `time.monotonic()` is system-wide on Linux, so the deadline written by the worker
+    can be compared with the clock of the parent.
+    """
+
+    def __init__(self, timeout: float) -> None:
+        self.timeout = timeout
+        self._data = RawArray(ctypes.c_double, 6)
+
+    # Called by the worker.
+
+    def arm(self, timeout: float | None = None) -> None:
+        """
+        Start a new deadline without counting an execution, `timeout` seconds away if given,
+        e.g. the shorter deadline of the next execution.
+        """
+        now = time.monotonic()
+        self._data[_ARMED] = now
+        self._data[_DEADLINE] = now + (self.timeout if timeout is None else timeout)
+
+    def beat(self) -> None:
+        """
+        Count one finished execution and start a new deadline.
+        """
+        data = self._data
+        data[_BEATS] += 1
+        data[_API_BEATS] += 1
+        data[_DEADLINE] = time.monotonic() + self.timeout
+
+    def new_api(self) -> None:
+        """
+        Reset the per-API counter and clock when the worker starts fuzzing another API.
+        """
+        self._data[_API_BEATS] = 0
+        self._data[_API_START] = time.monotonic()
+
+    def finish(self) -> None:
+        """
+        Signal that the worker has executed all its API calls.
+        """
+        self._data[_DONE] = 1
+
+    # Called by the parent.
+
+    def reset(self) -> None:
+        """
+        Prepare the heartbeat for a new worker.
+        """
+        self._data[_DONE] = 0
+        self.arm()
+
+    @property
+    def exec_num(self) -> int:
+        return int(self._data[_BEATS])
+
+    @property
+    def api_exec_num(self) -> int:
+        return int(self._data[_API_BEATS])
+
+    @property
+    def api_time(self) -> float:
+        """
+        The seconds since the worker started fuzzing its current API.
+        """
+        return time.monotonic() - self._data[_API_START]
+
+    @property
+    def exec_time(self) -> float:
+        """
+        The seconds since the current execution started, i.e. since the last `arm`.
+        """
+        return time.monotonic() - self._data[_ARMED]
+
+    @property
+    def done(self) -> bool:
+        return self._data[_DONE] == 1
+
+    def expired(self) -> bool:
+        return time.monotonic() > self._data[_DEADLINE]
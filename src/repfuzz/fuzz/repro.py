@@ -0,0 +1,222 @@
+import ctypes
+import os
+import signal
+import time
+from collections import deque
+from multiprocessing.sharedctypes import RawArray
+from typing import Any, Callable
+
+from repfuzz.tools.custom_obj_str import objjson
+
+_API_CALL_LEN = 0
+_DUMP_LEN = 1
+_DUMP_STATE = 2
+_RECORD_LEN = 3
+_RECORD_COMPLETE = 4
+
+_DUMP_NONE = 0
+_DUMP_REQUESTED = 1
+_DUMP_DONE = 2
+
+
+def _repr_size(obj: Any, limit: int) -> int:
+    """
+    A lower bound of `len(repr(obj))` for the output of `objjson`, the walk stops as soon
+    as the bound exceeds `limit`. An array counts its bytes, its repr is only a summary.
+    """
+    size = 0
+    stack = [obj]
+    while stack and size <= limit:
+        x = stack.pop()
+        if isinstance(x, (str, bytes, bytearray)):
+            size += len(x) + 2
+        elif isinstance(x, int):
+            size += x.bit_length() // 4 + 1
+        elif isinstance(x, (list, tuple, set, frozenset)):
+            size += len(x) + 2
+            stack.extend(x)
+        elif isinstance(x, dict):
+            size += 2 * len(x) + 2
+            stack.extend(x.keys())
+            stack.extend(x.values())
+        else:
+            nbytes = getattr(x, "nbytes", None)  # e.g. a numpy array or a torch tensor
+            size += nbytes if isinstance(nbytes, int) else 1
+    return size
+
+
+def _bounded_repr(obj: Any, limit: int) -> str:
+    if _repr_size(obj, limit) > limit:  # before the walk of `objjson`, e.g. a huge list
+        raise ValueError(f"it takes more than {limit} bytes")
+    data = objjson(obj)
+    if _repr_size(data, limit) > limit:
+        raise ValueError(f"it takes more than {limit} bytes")
+    return repr(data)
+
+
+def _format_record(api: Callable, args: tuple, kwargs: dict, limit: int) -> tuple[str, bool]:
+    """
+    Format an execution as the code reproducing it, or as a comment if its arguments can't
+    be serialized in `limit` bytes.
+
+    Returns:
+        tuple[str, bool]: The code, and whether the arguments have been serialized.
+    """
+    name = f"{api.__module__}.{api.__qualname__}"
+    try:
+        lines = [
+            f"import {api.__module__}",
+            f"args={_bounded_repr(args, limit)}",
+            f"kwargs={_bounded_repr(kwargs, limit)}",
+            f"{name}(*args, **kwargs)",
+        ]
+    except Exception as e:  # e.g. a recursive or a huge argument
+        return f"# Can't serialize the arguments of {name}: {e}\n", False
+    return "\n".join(lines) + "\n", True
+
+
+class ReproBuffer:
+    """
+    The reproduction data of a worker, i.e. the API call it executes and its last mutants.
+
+    Before each execution, the worker writes the code reproducing it into shared memory if
+    its arguments take at most `record_capacity` bytes, so the parent can read the
+    triggering mutant even if the worker is stuck in a C extension and can't handle a
+    signal. The arguments are serialized before the execution, so the API modifying them
+    in place doesn't change the record.
+
+    The worker also keeps references to the arguments of its last `size` executions in a
+    ring buffer. When the parent needs them, it sends SIGUSR1 to the worker, which then
+    serializes them into shared memory in up to `dump_capacity` bytes, including the last
+    execution if it was too large to be written beforehand. These ones show the arguments
+    after their execution, i.e. with the in-place modifications of the API.
+
+    The API call is copied into shared memory once per API call.
+    """
+
+    def __init__(
+        self, size: int, api_call_capacity: int, dump_capacity: int, record_capacity: int
+    ) -> None:
+        self.api_call_capacity = api_call_capacity
+        self.dump_capacity = dump_capacity
+        self.record_capacity = record_capacity
+        self._records: deque = deque(maxlen=size)
+        self._outer: list[tuple[list, str, bool]] = []  # the records of the enclosing APIs
+        self._header = RawArray(ctypes.c_int64, 5)
+        self._buf = RawArray(ctypes.c_char, api_call_capacity + dump_capacity + record_capacity)
+
+    def _write(self, offset: int, capacity: int, text: str) -> int:
+        data = text.encode("utf-8", errors="replace")[:capacity]
+        ctypes.memmove(ctypes.addressof(self._buf) + offset, data, len(data))
+        return len(data)
+
+    def _read(self, offset: int, length: int) -> str:
+        data = ctypes.string_at(ctypes.addressof(self._buf) + offset, length)
+        return data.decode("utf-8", errors="replace")
+
+    def _write_record(self, text: str, complete: bool) -> None:
+        self._header[_RECORD_LEN] = 0  # the parent never reads a half-written record
+        offset = self.api_call_capacity + self.dump_capacity
+        length = self._write(offset, self.record_capacity, text)
+        self._header[_RECORD_COMPLETE] = complete
+        self._header[_RECORD_LEN] = length
+
+    def _read_record(self) -> str:
+        offset = self.api_call_capacity + self.dump_capacity
+        return self._read(offset, self._header[_RECORD_LEN])
+
+    # Called by the worker.
+
+    def install(self) -> None:
+        """
+        Serialize the last executions when the parent sends SIGUSR1.
+        """
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.dump())
+
+    def set_api_call(self, api_call: str) -> None:
+        self._records.clear()
+        self._outer.clear()
+        self._write_record("", True)
+        self._header[_API_CALL_LEN] = self._write(0, self.api_call_capacity, api_call)
+
+    def begin_api(self) -> None:
+        """
+        Start recording the executions of an API, which may be nested in an execution of
+        another API, e.g. an instrumented function it calls.
+        """
+        complete = bool(self._header[_RECORD_COMPLETE])
+        self._outer.append((list(self._records), self._read_record(), complete))
+        self._records.clear()
+        self._write_record("", True)
+
+    def end_api(self) -> None:
+        """
+        Restore the records of the enclosing execution, if any, once an API is fuzzed.
+        """
+        records, text, complete = self._outer.pop()
+        self._records.clear()
+        self._records.extend(records)
+        self._write_record(text, complete)
+
+    def record(self, api: Callable, args: tuple, kwargs: dict) -> None:
+        self._records.append((api, args, kwargs))
+        text, complete = _format_record(api, args, kwargs, self.record_capacity)
+        if len(text) > self.record_capacity:
+            name = f"{api.__module__}.{api.__qualname__}"
+            text = f"# Can't serialize the arguments of {name} in {self.record_capacity} bytes\n"
+            complete = False
+        self._write_record(text, complete)
+
+    def dump(self) -> None:
+        records = list(self._records)
+        lines = []
+        for api, args, kwargs in records[:-1]:
+            text, _ = _format_record(api, args, kwargs, self.dump_capacity)
+            lines.extend(f"# {line}" for line in text.splitlines())  # not the triggering one
+        if records and not self._header[_RECORD_COMPLETE]:
+            text, _ = _format_record(*records[-1], self.dump_capacity)
+            lines.extend(text.splitlines())
+        text = "\n".join(lines) + "\n" if lines else ""
+        self._header[_DUMP_LEN] = self._write(self.api_call_capacity, self.dump_capacity, text)
+        self._header[_DUMP_STATE] = _DUMP_DONE
+
+    # Called by the parent.
+
+    def request_dump(self, pid: int, timeout: float) -> bool:
+        """
+        Ask the worker `pid` to serialize its last executions.
+
+        Args:
+            pid (int): The pid of the worker.
+            timeout (float): How long to wait for the worker in seconds.
+
+        Returns:
+            bool: Whether the worker has dumped its last executions in time.
+        """
+        self._header[_DUMP_STATE] = _DUMP_REQUESTED
+        try:
+            os.kill(pid, signal.SIGUSR1)
+        except ProcessLookupError:
+            return False
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._header[_DUMP_STATE] == _DUMP_DONE:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def read(self) -> tuple[str, str]:
+        """
+        Returns:
+            tuple[str, str]: The API call and the last executions of the worker, empty if
+                it was not executing a mutant. Only the triggering one is available if the
+                worker has not dumped them.
+        """
+        api_call = self._read(0, self._header[_API_CALL_LEN])
+        record = self._read_record()
+        if self._header[_DUMP_STATE] != _DUMP_DONE:
+            return api_call, record
+        dump = self._read(self.api_call_capacity, self._header[_DUMP_LEN])
+        if not self._header[_RECORD_COMPLETE]:  # the dump has serialized it then
+            return api_call, dump
+        return api_call, dump + record
@@ -1,18 +1,65 @@
-import inspect
-from functools import wraps
+import importlib.metadata
+import json
+import os
+import platform
 import sys
+from functools import wraps
+from importlib.abc import Loader, MetaPathFinder
+from pathlib import Path
 from types import BuiltinFunctionType, FunctionType, ModuleType
+
 import dcov
 from loguru import logger
 
+from repfuzz.config import FUZZ
 from repfuzz.fuzz.fuzz_api import fuzz_api
-fuzzed_list = []
 
+fuzzing = False  # set by the workers, the instrumented functions are not fuzzed before
 
-def instrument_function(func: FunctionType | BuiltinFunctionType):
+
+def instrument_function(func: FunctionType | BuiltinFunctionType, constructor: bool = False):
     """
     Return a instrumented version of `func`, which should fuzz the current call
     before return.
+
+    A method is fuzzed with its receiver as the first argument. If `constructor` is set,
+    `func` is an `__init__`, and the class of the instance, which may be a subclass
+    inheriting `__init__`, is fuzzed with the arguments of the call instead, so each mutant
+    constructs a new instance.
+
+    Only the first call in each worker fuzzes `func`, the later calls just check a flag
+    and call `func`, since the library calls its own public functions all the time.
+    The calls made before `fuzzing` is set, e.g. while the library is imported, are not
+    fuzzed.
+    The coverage of every call is only logged if `FUZZ.log_wrapper_coverage` is set.
+    """
+    fuzzed = False
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        nonlocal fuzzed
+        if fuzzed or not fuzzing:
+            return func(*args, **kwargs)
+        fuzzed = True  # the nested and recursive calls don't fuzz it again.
+        try:
+            res = func(*args, **kwargs)
+        except BaseException:
+            fuzzed = False  # fuzz it from the next call, whose arguments may be valid.
+            raise
+        if constructor:
+            fuzz_api(type(args[0]), *args[1:], **kwargs)
+        else:
+            fuzz_api(func, *args, **kwargs)
+        return res
+
+    if FUZZ.log_wrapper_coverage:
+        return log_coverage(wrapper)
+    return wrapper
+
+
+def log_coverage(func):
+    """
+    Return a version of `func` logging the coverage increased by each call.
     """
 
     @wraps(func)
@@ -22,58 +69,230 @@ def instrument_function(func: FunctionType | BuiltinFunctionType):
         p1 = dcov.count_bitmap_py()
         if p1 > p0:
             logger.info(f"Coverage increased {p1-p0}, now: {p1} (F)")
-        full_name = f"{func.__module__}.{func.__name__}"
-        if full_name not in fuzzed_list:
-            fuzzed_list.append(full_name)
-            fuzz_api(func, *args, **kwargs)
         return res
 
     return wrapper
 
 
 mod_has_been_seen = set()
+classes_have_been_seen = set()
 top_mod = None
 top_mod_name = None
 
+PLAN_FORMAT = 2  # the cached plans of another format are discovered again
 
-def instrument_module(mod: ModuleType) -> None:
+
+class InstrumentLoader(Loader):
     """
-    Recursively instrument all functions in the given module, below the top module.
-    This function should be called for the top-level module, and it will handle all
-    existing and sub-modules.
+    Instrument a module right after the loader found for it has executed it.
+    """
+
+    def __init__(self, loader: Loader) -> None:
+        self.loader = loader
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module: ModuleType) -> None:
+        self.loader.exec_module(module)
+        instrument_module(module)
+
+    def __getattr__(self, name: str):
+        return getattr(self.loader, name)  # e.g. get_source or get_resource_reader
+
+
+class InstrumentFinder(MetaPathFinder):
+    """
+    An import hook instrumenting the submodules of the top module which are imported
+    after `instrument_module`, e.g. lazily by the library when they are first accessed.
+    It delegates the search of the modules to the finders after it, e.g. the one of dcov.
+    """
+
+    def find_spec(self, fullname: str, path, target=None):
+        if not fullname.startswith(f"{top_mod_name}."):
+            return None
+        idx = sys.meta_path.index(self) if self in sys.meta_path else len(sys.meta_path)
+        for finder in sys.meta_path[idx + 1 :]:
+            find_spec = getattr(finder, "find_spec", None)
+            spec = find_spec(fullname, path, target) if find_spec is not None else None
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = InstrumentLoader(spec.loader)
+        return spec
+
+
+def discover(mod: ModuleType, plan: dict) -> dict:
+    """
+    Recursively find all functions and classes in the given module and its submodules, below the top
+    module, without touching them.
+
+    The attributes are read from the `__dict__` of the modules, so the attributes that a
+    module resolves lazily, e.g. submodules not imported yet, are not evaluated.
 
     Args:
-        mod: The module to instrument.
-        top_mod_name: The top-level module name that should be above the module
-            that is being instrumented.
+        mod: The module to walk.
+        plan: The plan to extend, with the names of the walked `"modules"`, the
+            `"functions"` found as `(module, name, true module)`, where the true module
+            is the one the function belongs to, and the `"classes"` found as
+            `(module, name)`.
+
+    Returns:
+        dict: The plan.
     """
-    global mod_has_been_seen, top_mod, top_mod_name
-    if top_mod is None:
-        top_mod = mod
-        top_mod_name = mod.__name__
     if id(mod) in mod_has_been_seen:
-        return
+        return plan
     mod_has_been_seen.add(id(mod))
-    for name, obj in inspect.getmembers(mod):
+    plan["modules"].append(mod.__name__)
+    for name, obj in sorted(vars(mod).items()):
         if name.startswith("_"):  # Skip modules and fuctions that are for internal use
             continue
         if isinstance(obj, ModuleType):
             if obj.__name__.startswith(top_mod_name):
-                instrument_module(obj)
+                discover(obj, plan)
         elif isinstance(obj, (FunctionType, BuiltinFunctionType)):
             true_module_path = obj.__module__
             if true_module_path is None:  # Skip functions that do not belong to any module
                 continue
-            tokens = true_module_path.split('.')
-            if not tokens[0] == top_mod_name: # Skip functions that does not belong to the top-level module
+            # Skip functions that do not belong to the top-level module
+            if true_module_path.split(".")[0] != top_mod_name:
                 continue
-            new_func = instrument_function(obj)
-            setattr(new_func, 'original__func', obj)
+            plan["functions"].append((mod.__name__, name, true_module_path))
+        elif isinstance(obj, type):
+            if (obj.__module__ or "").split(".")[0] == top_mod_name:
+                plan["classes"].append((mod.__name__, name))
+    return plan
+
+
+def apply_plan(plan: dict) -> None:
+    """
+    Instrument the functions and the classes of a plan made by `discover`. The modules
+    which are not imported and the functions which are gone or already instrumented are
+    skipped.
+    """
+    for module_path, name, true_module_path in plan["functions"]:
+        module = _resolve(module_path)
+        true_module = _resolve(true_module_path)
+        if module is None or true_module is None:
+            continue
+        obj = vars(module).get(name)
+        if not isinstance(obj, (FunctionType, BuiltinFunctionType)):
+            continue
+        if hasattr(obj, "original__func") or hasattr(vars(true_module).get(name), "original__func"):
+            continue
+        new_func = instrument_function(obj)
+        setattr(new_func, "original__func", obj)
+        setattr(true_module, name, new_func)
+    for module_path, name in plan["classes"]:
+        module = _resolve(module_path)
+        cls = vars(module).get(name) if module is not None else None
+        if isinstance(cls, type):
+            instrument_class(cls)
+
+
+def instrument_class(cls: type) -> None:
+    """
+    Instrument in place the public methods and the `__init__` of a class, and of its base
+    classes in the library, e.g. the methods a DataFrame inherits from NDFrame. The static
+    and class methods are instrumented too, the properties and the exceptions are not.
+    """
+    for klass in cls.__mro__:
+        if klass in classes_have_been_seen or (klass.__module__ or "").split(".")[0] != top_mod_name:
+            continue
+        classes_have_been_seen.add(klass)
+        if issubclass(klass, BaseException):
+            continue
+        for name, attr in list(vars(klass).items()):
+            if name.startswith("_") and name != "__init__":
+                continue
+            func = attr.__func__ if isinstance(attr, (staticmethod, classmethod)) else attr
+            if not isinstance(func, FunctionType) or hasattr(func, "original__func"):
+                continue
+            new_func = instrument_function(func, constructor=name == "__init__")
+            setattr(new_func, "original__func", func)
+            if isinstance(attr, (staticmethod, classmethod)):
+                new_func = type(attr)(new_func)
             try:
-                true_module = top_mod
-                for x in tokens[1:]:
-                    true_module = getattr(true_module, x)
-                setattr(true_module, name, new_func)
-                # print(f"Instrumented function: {true_module_path}.{name}", file=sys.__stdout__)
-            except Exception:
-                pass
+                setattr(klass, name, new_func)
+            except (TypeError, AttributeError):  # e.g. a class with a custom metaclass
+                break
+
+
+def _resolve(module_path: str) -> ModuleType | None:
+    # the lookups never go through the `__getattr__` of a module, which may import lazily.
+    module = sys.modules.get(module_path)
+    if module is None:  # e.g. a module created by the library and never imported
+        module = top_mod
+        for x in module_path.split(".")[1:]:
+            module = vars(module).get(x)
+            if not isinstance(module, ModuleType):
+                return None
+    return module
+
+
+def new_plan() -> dict:
+    return {"format": PLAN_FORMAT, "modules": [], "functions": [], "classes": []}
+
+
+def get_plan_path(mod: ModuleType) -> Path:
+    """
+    Get the path of the cached instrumentation plan of a version of a library. The
+    standard library is versioned by the version of Python.
+    """
+    try:
+        version = importlib.metadata.version(mod.__name__)
+    except importlib.metadata.PackageNotFoundError:
+        version = getattr(mod, "__version__", None) or platform.python_version()
+    return FUZZ.instrument_plan_dir.joinpath(f"{mod.__name__}-{version}.json")
+
+
+def load_plan(path: Path) -> dict | None:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_plan(path: Path, plan: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(plan, f)
+    os.replace(tmp_path, path)  # the concurrent campaigns never read a partial plan.
+
+
+def instrument_module(mod: ModuleType) -> None:
+    """
+    Instrument all functions and classes in the given module and its submodules, below the
+    top module.
+    This function should be called for the top-level module, and it will handle all
+    existing and sub-modules.
+
+    The top module is walked by `discover` the first time a version of the library is
+    instrumented, the plan is then loaded from `FUZZ.instrument_plan_dir`. The submodules
+    imported later are instrumented by an import hook when they are imported.
+
+    Args:
+        mod: The module to instrument.
+    """
+    global top_mod, top_mod_name
+    if top_mod is not None:
+        apply_plan(discover(mod, new_plan()))
+        return
+    top_mod = mod
+    top_mod_name = mod.__name__
+    sys.meta_path.insert(0, InstrumentFinder())
+
+    plan_path = get_plan_path(mod)
+    plan = load_plan(plan_path)
+    if plan is None or plan.get("format") != PLAN_FORMAT:
+        plan = discover(mod, new_plan())
+        save_plan(plan_path, plan)
+    else:
+        for module_path in plan["modules"]:
+            if module_path in sys.modules:
+                mod_has_been_seen.add(id(sys.modules[module_path]))
+    apply_plan(plan)
@@ -11,10 +11,12 @@ from colorama import Fore
 from repfuzz.config import CHAT_LLM, tgts
 from repfuzz.database.models import API
 from repfuzz.database.sqlite_proxy import (
-    get_all_apis,
+    count_api_calls,
+    flush_buffered_writers,
+    get_api_call_writer,
     get_or_create_db,
-    insert_into_api_call,
-    query_api_call_by_full_name,
+    iter_apis,
+    query_api_by_full_name,
 )
 from repfuzz.llm import async_generate
 from repfuzz.prompts.gen_prompts import get_gen_prompt
@@ -43,9 +45,10 @@ async def generate_api_call(api: API) -> None:
     cnt_try += 1
     api_name = api.full_name
     module_tokens = api_name.split(".")
-    conn = get_or_create_db(module_tokens[0])
 
     print(f"{Fore.BLUE}Start generating call to {api_name}{Fore.RESET}")
+    # the queue only holds the names and the argument counts, load the rest for the prompt.
+    api = query_api_by_full_name(get_or_create_db(module_tokens[0]), api_name)
 
     success = False
     for _ in range(20):
@@ -83,7 +86,7 @@ async def generate_api_call(api: API) -> None:
 
     if success:
         cnt_success += 1
-        insert_into_api_call(conn, api_name, api_call)
+        get_api_call_writer(module_tokens[0]).add((api_name, api_call))
     else:
         print(f"{Fore.RED}Failed to generate call to {api_name}{Fore.RESET}")
 
@@ -122,11 +125,12 @@ async def async_main():
     t0 = time.time()
     for trg_name in tgts:
         conn = get_or_create_db(trg_name)
-        for api in get_all_apis(conn):
+        generated = count_api_calls(conn)
+        for api in iter_apis(conn, ["full_name", "num_normal_arg", "num_kwonly_arg"]):
             # 没有参数的api没有测试价值
             if (api.num_normal_arg + api.num_kwonly_arg) == 0:
                 continue
-            if len(query_api_call_by_full_name(conn, api.full_name)) > 0:
+            if api.full_name in generated:
                 continue
             queue.put_nowait(api)
     qs = queue.qsize()
@@ -141,6 +145,7 @@ async def async_main():
     for task in tasks:
         task.cancel()
     await asyncio.gather(*tasks, return_exceptions=True)
+    flush_buffered_writers()
     dt = time.time() - t0
     print(f"It takes {dt:.2f} seconds to try generating {qs} api calls")
 
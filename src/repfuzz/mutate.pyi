@@ -1,4 +1,24 @@
+from collections.abc import Buffer
+
 def mutate_int(a: int) -> int: ...
 def mutate_str(s: str) -> str: ...
 def mutate_float(f: float) -> float: ...
 def mutate_bytes(b: bytes) -> bytes: ...
+def mutate_int_n(a: int, k: int) -> list[int]: ...
+def mutate_str_n(s: str, k: int) -> list[str]: ...
+def mutate_float_n(f: float, k: int) -> list[float]: ...
+def mutate_bytes_n(b: bytes, k: int) -> list[bytes]: ...
+def mutate_buffer(b: Buffer) -> Buffer:
+    """
+    Mutate a writable C-contiguous buffer, e.g. a bytearray or a numpy array, in place and
+    return it. A read-only buffer, e.g. bytes, is copied into a new bytes object which is
+    mutated and returned instead. The length of the buffer never changes.
+    """
+
+def seed(n: int) -> None:
+    """
+    Seed the random number generator of the calling thread, so the mutants are reproducible.
+
+    The generator is seeded from `std::random_device` on first use otherwise, and again in
+    a forked child, like `random` does.
+    """
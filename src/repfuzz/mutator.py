@@ -1,8 +1,16 @@
 import copy
 import random
-from typing import Any, Dict, FrozenSet, Iterable, List, Set, Tuple
-
-from repfuzz.mutate import mutate_bytes, mutate_float, mutate_int, mutate_str
+from types import BuiltinFunctionType, FunctionType, ModuleType
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from repfuzz.array_mutator import get_array_copier, get_array_mutator, shares_memory
+from repfuzz.mutate import (
+    mutate_buffer,
+    mutate_bytes,
+    mutate_float,
+    mutate_int,
+    mutate_str,
+)
 
 VALUE_TYPES = [
     (int, "int"),
@@ -11,6 +19,7 @@ VALUE_TYPES = [
     (bool, "bool"),
     (str, "str"),
     (bytes, "bytes"),
+    (bytearray, "bytearray"),
     (List, "list"),
     (Tuple, "tuple"),
     (Set, "set"),
@@ -27,15 +36,34 @@ def get_type(old_val) -> str:
     raise ValueError(f"Unknown value type {old_val}")
 
 
+def _keep(old_val):
+    return old_val
+
+
+_mutators: Dict[type, Callable] = {
+    type(None): _keep,
+    type: _keep,  # classes are not mutated
+}
+
+
+def get_mutator(old_val) -> Callable:
+    """
+    Get the mutator for the type of `old_val`.
+
+    The mutator of each concrete type is resolved the first time the type is seen, then it
+    is a dict lookup. numpy arrays and torch tensors get the vectorized mutators of
+    `repfuzz.array_mutator`, the other types are resolved through `get_type`.
+    """
+    cls = type(old_val)
+    func = _mutators.get(cls)
+    if func is None:
+        func = get_array_mutator(cls) or globals()[f"mutate_{get_type(old_val)}"]
+        _mutators[cls] = func
+    return func
+
+
 def mutate_auto(old_val):
-    if old_val is None:
-        return None
-    if isinstance(old_val, object) and type(old_val) is type(object):
-        return old_val
-    type_ = get_type(old_val)
-    func_name = f"mutate_{type_}"
-    func = globals()[func_name]
-    return func(old_val)
+    return get_mutator(old_val)(old_val)
 
 
 def mutate_complex(old_val: complex) -> complex:
@@ -96,9 +124,7 @@ def mutate_list_expand(old_val: list) -> list:
         return []
     t = random.choice(old_val)
     new_t = mutate_auto(t)
-    new_val = copy.deepcopy(old_val)
-    new_val.append(new_t)
-    return new_val
+    return old_val + [new_t]  # the other elements are shared with `old_val`.
 
 
 def mutate_list_random_one(old_val: list) -> list:
@@ -127,9 +153,9 @@ def mutate_tuple(old_val: tuple) -> tuple:
 
 
 def mutate_bytearray(old_val: bytearray) -> bytearray:
-    tmp_val = list(old_val)
-    new_val = [min(max(0, x), 255) for x in mutate_list(tmp_val)]
-    return bytearray(new_val)
+    if random.randint(0, 3):
+        return mutate_buffer(bytearray(old_val))  # one copy, then mutated in place in C
+    return bytearray(mutate_bytes(bytes(old_val)))  # grow or shrink it
 
 
 def mutate_set(old_val: set) -> set:
@@ -142,11 +168,10 @@ def mutate_frozenset(old_val: frozenset) -> frozenset:
 
 
 def mutate_dict(old_val: dict) -> dict:
-    new_val = copy.deepcopy(old_val)
-    keys = list(new_val.keys())
-    if len(keys) == 0:
+    if len(old_val) == 0:
         return old_val
-    mt_key = random.choice(keys)
+    new_val = copy.copy(old_val)  # keep the type of the dict, the values are shared.
+    mt_key = random.choice(list(new_val.keys()))
     new_val[mt_key] = mutate_auto(new_val[mt_key])
     return new_val
 
@@ -166,14 +191,91 @@ def mutate_instance(old_val: object) -> object:
     return new_val
 
 
+def _shallow_copy(old_val):
+    try:
+        return copy.copy(old_val)
+    except Exception:  # e.g. a lock or an open file
+        return old_val
+
+
+# None for the types which can't be modified in place
+_copiers: Dict[type, Optional[Callable]] = {
+    cls: None
+    for cls in (
+        type(None),
+        bool,
+        int,
+        float,
+        complex,
+        str,
+        bytes,
+        tuple,
+        frozenset,
+        range,
+        type,
+        FunctionType,
+        BuiltinFunctionType,
+        ModuleType,
+    )
+}
+
+
+def get_copier(cls: type) -> Optional[Callable]:
+    """
+    Get the function making a shallow copy of a value of type `cls`, None if `cls` is
+    immutable. Arrays and tensors are copied with their layout.
+    """
+    if cls in _copiers:
+        return _copiers[cls]
+    func = get_array_copier(cls) or _shallow_copy
+    _copiers[cls] = func
+    return func
+
+
+def unshare(new_val, old_val):
+    """
+    Copy a mutated argument if it is still the argument `old_val` of the seed, or a view
+    of it, e.g. a list mutation leaving a short list as it is or a reversed array.
+    """
+    copier = get_copier(type(new_val))
+    if copier is None:
+        return new_val
+    if new_val is old_val or (copier is not _shallow_copy and shares_memory(new_val, old_val)):
+        return copier(new_val)
+    return new_val
+
+
+def copy_param_list(param_list: List) -> List:
+    """
+    Shallow-copy the mutable arguments of an API call, e.g. once before fuzzing it, so the
+    mutants sharing them don't modify the objects of the caller.
+    """
+    new_val = []
+    for val in param_list:
+        copier = get_copier(type(val))
+        new_val.append(val if copier is None else copier(val))
+    return new_val
+
+
 def mutate_param_list(old_val: List[Dict]) -> List:
+    """
+    Mutate some of the arguments in `old_val`.
+
+    The mutators never modify their input, they return a new value or the input itself,
+    so the arguments are not deep-copied for every mutant. Only the mutated slots are
+    copied, when the mutator has returned the argument of the seed or a view of it, the
+    other ones are shared with `old_val`: an API modifying them in place modifies the seed
+    too, like a mutation of it.
+    """
     a = len(old_val)
-    if a <= 1:
+    if a == 0:  # a single argument is mutated too
         return old_val
-    new_val = copy.deepcopy(old_val)
+    new_val = list(old_val)
     mt_num = random.randint(0, a) + 1
     full_idx = list(range(a))
     mt_idx = random.choices(full_idx, k=mt_num)
     for i in mt_idx:
         new_val[i] = mutate_auto(new_val[i])
+    for i in set(mt_idx):
+        new_val[i] = unshare(new_val[i], old_val[i])
     return new_val
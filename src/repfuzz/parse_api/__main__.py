@@ -11,6 +11,7 @@ from colorama import Fore
 
 from repfuzz.config import CHAT_LLM, tgts
 from repfuzz.database.sqlite_proxy import (
+    flush_buffered_writers,
     get_or_create_db,
     query_api_by_full_name,
     set_public_apis,
@@ -37,6 +38,11 @@ def traverse_all_apis_in_module(
                     continue
                 if obj.__module__.startswith(top_mod_name):
                     queue.add(obj)
+            elif isinstance(obj, type):
+                if any(list(filter(lambda x: x.startswith("_"), obj.__module__.split(".")))):
+                    continue
+                if obj.__module__.startswith(top_mod_name) and not issubclass(obj, BaseException):
+                    queue.update(get_class_apis(obj))
             elif isinstance(obj, ModuleType):
                 try:
                     obj_full_name = obj.__name__
@@ -50,10 +56,26 @@ def traverse_all_apis_in_module(
             continue
 
 
+def get_class_apis(cls: type) -> list:
+    """
+    Get the APIs of a public class: the class itself, as its constructor, if its `__init__`
+    is defined in Python, and its public methods, including the static and class methods.
+    """
+    apis: list = [cls] if isinstance(cls.__init__, FunctionType) else []
+    for name, attr in vars(cls).items():
+        if name.startswith("_"):
+            continue
+        if isinstance(attr, (staticmethod, classmethod)):
+            attr = attr.__func__
+        if isinstance(attr, FunctionType):
+            apis.append(attr)
+    return apis
+
+
 def avoid_repeated_parsing(queue: list, conn):
     repeated_apis = []
     for api in queue:
-        full_name = api.__module__ + "." + api.__name__  # full name of the api
+        full_name = api.__module__ + "." + api.__qualname__  # full name of the api
         if query_api_by_full_name(conn, full_name):
             repeated_apis.append(api)
     for api in repeated_apis:
@@ -100,9 +122,9 @@ async def async_main():
         conn = get_or_create_db(trg_name)
         target = importlib.import_module(trg_name)
         traverse_all_apis_in_module(target, trg_name, set(), t_list)
-        api_names = [api.__module__ + "." + api.__name__ for api in t_list]
+        api_names = [api.__module__ + "." + api.__qualname__ for api in t_list]
         set_public_apis(conn, api_names)
-        print(f"{trg_name} contains {len(t_list)} public functions")
+        print(f"{trg_name} contains {len(t_list)} public functions, classes and methods")
         avoid_repeated_parsing(t_list, conn)
         api_list.extend(t_list)
     print(f"Traversing done, there are {len(api_list)} apis to parse")
@@ -121,6 +143,7 @@ async def async_main():
     for task in tasks:
         task.cancel()
     await asyncio.gather(*tasks, return_exceptions=True)
+    flush_buffered_writers()
 
     print(f"\n{Fore.GREEN}All things done!{Fore.RESET}")
 
@@ -7,7 +7,7 @@ from typing import Any, Callable, List
 from colorama import Fore
 
 from repfuzz.database.models import Argument
-from repfuzz.database.sqlite_proxy import get_or_create_db, insert_into_api
+from repfuzz.database.sqlite_proxy import get_api_writer
 from repfuzz.llm import async_generate
 from repfuzz.prompts.parse_prompts import (
     get_builtin_function_prompt,
@@ -19,8 +19,8 @@ from repfuzz.tools.tools import find_function_definition_in
 class APIParser:
     def __init__(self, api: Callable) -> None:
         self.api = api
-        self.db_conn = get_or_create_db(api.__module__.split(".")[0])
-        self.full_name = f"{api.__module__}.{api.__name__}"
+        self.db_name = api.__module__.split(".")[0]
+        self.full_name = f"{api.__module__}.{api.__qualname__}"
         self.type: str = ""
         self.source = ""
         self.doc = ""
@@ -30,7 +30,7 @@ class APIParser:
         self.kwonly_arg_list: List[Argument] = []
 
     def save_to_db(self):
-        insert_into_api(self.db_conn, self)
+        get_api_writer(self.db_name).add(self)
 
     async def parse(self):
         self.parse_type()
@@ -97,9 +97,13 @@ class FunctionParser(APIParser):
         await self.parse_arg_type()
         print(f"{Fore.GREEN}Finished parsing user-define function {self.full_name}{Fore.RESET}")
 
+    @property
+    def func(self) -> FunctionType:
+        """The function whose code has the arguments of the API."""
+        return self.api
+
     def parse_arg_num_and_name(self):
-        func: FunctionType = self.api
-        code = func.__code__
+        code = self.func.__code__
         self.num_normal_arg = code.co_argcount
         self.num_kwonly_arg = code.co_kwonlyargcount
         var_names = code.co_varnames
@@ -134,6 +138,40 @@ class FunctionParser(APIParser):
         raise Exception("Parse Failed")
 
 
+class MethodParser(FunctionParser):
+    """
+    A method defined in a class of the library, e.g. `pandas.DataFrame.head`.
+
+    It is parsed like a function, the receiver (`self` or `cls`) is kept as its first
+    argument, since it is an object of the library the API call has to construct.
+    """
+
+    def parse_type(self):
+        self.type = str(MethodType)
+
+
+class ConstructorParser(FunctionParser):
+    """
+    A class of the library, called to construct its instances, e.g. `pandas.DataFrame`.
+
+    Its source and docstring are the ones of the class, its arguments are the ones of its
+    `__init__` without `self`.
+    """
+
+    def parse_type(self):
+        self.type = str(type)
+
+    @property
+    def func(self) -> FunctionType:
+        return self.api.__init__
+
+    def parse_arg_num_and_name(self):
+        super().parse_arg_num_and_name()
+        if self.normal_arg_list:  # self is created by the call
+            self.normal_arg_list.pop(0)
+            self.num_normal_arg -= 1
+
+
 class BuiltinFunctionParser(FunctionParser):
     """
     Builtin function does not have source.
@@ -181,14 +219,19 @@ class BuiltinFunctionParser(FunctionParser):
 
 
 async def parse_api(api: Callable):
-    if isinstance(api, FunctionType):
-        parser = FunctionParser(api)
+    if isinstance(api, type):
+        if not isinstance(api.__init__, FunctionType):
+            raise TypeError(f"{api.__qualname__} has no __init__ defined in Python")
+        parser = ConstructorParser(api)
+    elif isinstance(api, FunctionType):
+        if api.__qualname__ != api.__name__:  # defined in a class
+            parser = MethodParser(api)
+        else:
+            parser = FunctionParser(api)
     elif isinstance(api, BuiltinFunctionType):
         parser = BuiltinFunctionParser(api)
-    elif isinstance(api, BuiltinMethodType):
-        raise NotImplementedError
     elif isinstance(api, MethodType):
-        raise NotImplementedError
+        parser = MethodParser(api.__func__)
     else:
         raise TypeError("Unknown type of API")
     await parser.parse()
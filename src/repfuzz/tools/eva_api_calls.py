@@ -1,26 +1,24 @@
-import asyncio
-import importlib
 import io
 import os
 import signal
 import sys
 import time
-from multiprocessing import Pipe, Process, Queue
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from typing import Iterable, Iterator
+
 import tqdm
 from colorama import Fore
 
-from repfuzz.config import CHAT_LLM, LIBRARY_DATA_DIR, skip, tgts
+from repfuzz.config import skip, tgts
 from repfuzz.database.sqlite_proxy import (
-    _create_table,
     add_fuzz_record,
-    get_all_api_cals,
-    get_all_apis,
     get_or_create_db,
-    insert_into_api_call,
-    query_api_call_by_full_name,
+    iter_api_calls,
 )
-from repfuzz.gen_api_call import clean_api_call, handle_sigint
-from repfuzz.prompts.gen_prompts import get_gen_prompt
+
+BATCH_SIZE = 100
+CALL_TIMEOUT = 2  # seconds, on top of the 1 second alarm of `time_limit_exec`
 
 
 def time_limit_exec(code, seconds: int = 1):
@@ -37,21 +35,96 @@ def time_limit_exec(code, seconds: int = 1):
         signal.alarm(0)
 
 
-def eval_func(library: str, data: Queue, conn):
+def eval_func(library: str, conn: Connection):
+    """
+    The evaluator process: execute the batches of `(rowid, api_call)` received from `conn`
+    until None is received, and send back the rowid of each API call once it is executed.
+    """
     print(f"eval_func for {library} start", file=sys.__stdout__, flush=True)
-    while not data.empty():
-        full_name, api_call = data.get()
-        try:
-            time_limit_exec(api_call)
-        except Exception:
-            pass
-        conn.send(0)
-    conn.send(1)
+    while (batch := conn.recv()) is not None:
+        for rowid, api_call in batch:
+            try:
+                time_limit_exec(api_call)
+            except Exception:
+                pass
+            conn.send(rowid)
 
 
-def main():
-    batch_size = 100
+class Evaluator:
+    """
+    A long-lived evaluator process of a library, which is only restarted when an API call
+    hangs, so the library is imported once instead of once per batch.
+    """
+
+    def __init__(self, library: str, timeout: float = CALL_TIMEOUT) -> None:
+        self.library = library
+        self.timeout = timeout
+        self.restart_num = 0
+        self._start()
+
+    def _start(self) -> None:
+        self.conn, c_conn = Pipe()
+        self.process = Process(target=eval_func, args=(self.library, c_conn))
+        self.process.start()
+        c_conn.close()
+
+    def _restart(self) -> None:
+        os.kill(self.process.pid, 9)
+        self.process.join()
+        self.process.close()
+        self.conn.close()
+        self.restart_num += 1
+        self._start()
+
+    def run(self, batch: list[tuple[int, str]]) -> Iterator[tuple[int, bool]]:
+        """
+        Execute a batch of API calls.
+
+        If an API call does not finish within the timeout or crashes the evaluator, the
+        evaluator is restarted and the batch continues with the next API call.
 
+        Args:
+            batch (list[tuple[int, str]]): The `(rowid, api_call)` to execute.
+
+        Yields:
+            tuple[int, bool]: The rowid of each API call and whether it finished in time.
+        """
+        while batch:
+            self.conn.send(batch)
+            for i, (rowid, _) in enumerate(batch):
+                if self.conn.poll(self.timeout):
+                    try:
+                        self.conn.recv()
+                        yield rowid, True
+                        continue
+                    except EOFError:  # the evaluator died, e.g. the API call crashed it.
+                        pass
+                print(f"API call {rowid} timeout or crash, restarting", file=sys.__stdout__)
+                yield rowid, False
+                self._restart()
+                batch = batch[i + 1 :]
+                break
+            else:
+                return
+
+    def close(self) -> None:
+        self.conn.send(None)
+        self.process.join()
+        self.process.close()
+
+
+def batched(rows: Iterable[tuple[int, str, str]], batch_size: int) -> Iterator[list[tuple[int, str]]]:
+    batch = []
+    for rowid, _, api_call in rows:
+        batch.append((rowid, api_call))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def main():
     for lib in tgts:
         if lib in skip:
             continue
@@ -69,50 +142,18 @@ def main():
         )
         t0 = time.time()
         cnt = 0
-        for offset in range(0, total, batch_size):
-            cur.execute(
-                "SELECT full_name, api_call FROM api_call ORDER BY full_name LIMIT ? OFFSET ?",
-                (
-                    batch_size,
-                    offset,
-                ),
-            )
-            data = cur.fetchall()
-            data_queue = Queue()
-            for x in data:
-                data_queue.put(x)
-            r_size = data_queue.qsize()
-            cnt += data_queue.qsize()
-            # print(f"handle {data_queue.qsize()}")
-            fail = False
-            while not data_queue.empty():
-                p_conn, c_conn = Pipe()
-                p = Process(
-                    target=eval_func,
-                    args=(
-                        lib,
-                        data_queue,
-                        c_conn,
-                    ),
-                )
-                p.start()
-                while True:
-                    if p_conn.poll(1):
-                        r = p_conn.recv()
-                        if r:
-                            break
-                    else:
-                        print("Child timeout, killing", file=sys.__stdout__)
-                        os.kill(p.pid, 9)
-                        fail = True  # Abort the current batch_size api calls
-                        break
-                p.join()
-                p.close()
-                if fail:
-                    break
-            pbar.update(r_size)
+        evaluator = Evaluator(lib)
+        """
+        The API calls are paged by rowid, each page starts after the last rowid of the
+        previous one, so sqlite neither sorts the table nor skips rows for each batch.
+        """
+        for batch in batched(iter_api_calls(conn, chunk_size=BATCH_SIZE), BATCH_SIZE):
+            for _ in evaluator.run(batch):
+                cnt += 1
+                pbar.update(1)
+        evaluator.close()
         dt = time.time() - t0
-        add_fuzz_record(conn, int(time.time()), cnt, dt, 0)
+        add_fuzz_record(conn, int(time.time()), cnt, dt, 0, evaluator.restart_num)
         pbar.close()
 
 
@@ -7,9 +7,10 @@ from colorama import Fore
 from repfuzz.config import CHAT_LLM, tgts
 from repfuzz.database.models import API
 from repfuzz.database.sqlite_proxy import (
+    flush_buffered_writers,
     get_all_apis,
+    get_api_call_writer,
     get_or_create_db,
-    insert_into_api_call,
     query_api_call_by_full_name,
 )
 from repfuzz.gen_api_call import clean_api_call, handle_sigint
@@ -23,14 +24,13 @@ async def generate_api_call(queue: asyncio.Queue, n: int = 1000):
         for _ in range(n):
             api_name = api.full_name
             module_tokens = api_name.split(".")
-            conn = get_or_create_db(module_tokens[0])
 
             prompt = get_gen_prompt(api)
 
             print(f"{Fore.BLUE}Start generating call to {api_name}{Fore.RESET}")
             api_call = await async_generate(prompt)
             api_call = clean_api_call(api_call)
-            insert_into_api_call(conn, api_name, api_call)
+            get_api_call_writer(module_tokens[0]).add((api_name, api_call))
             print(f"{Fore.GREEN}Finished generating call to {api_name}{Fore.RESET}")
         queue.task_done()
 
@@ -52,6 +52,7 @@ async def async_main():
     for task in tasks:
         task.cancel()
     await asyncio.gather(*tasks, return_exceptions=True)
+    flush_buffered_writers()
 
     dt = time.time() - t0
     print(f"It takes {dt:.2f} seconds to try generating api calls")
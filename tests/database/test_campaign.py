@@ -0,0 +1,80 @@
+import os
+import signal
+
+from repfuzz.database.campaign import (
+    DONE,
+    FUZZING,
+    IMPORTING,
+    RUNNING,
+    TIMEOUT,
+    Campaign,
+    get_campaigns,
+)
+
+
+def test_campaign(tmp_path):
+    db_path = tmp_path / "fuzz.db"
+    campaign = Campaign.create("lib", 2, db_path)
+    assert not campaign.can_fuzz("lib.f")  # the library is still being imported.
+    campaign.set_status(FUZZING)
+    assert campaign.can_fuzz("lib.f")
+    campaign.set_api_status("lib.f", FUZZING)
+    assert not campaign.can_fuzz("lib.f")
+    campaign.set_api_status("lib.f", DONE)
+    campaign.set_worker_status(0, 123, RUNNING)
+    campaign.set_worker_status(0, 123, TIMEOUT)
+    campaign.flush()
+
+    conn = campaign.conn
+    assert conn.execute("SELECT status FROM api_status").fetchall() == [(DONE,)]
+    assert conn.execute("SELECT worker_id, pid, status FROM worker").fetchall() == [(0, 123, TIMEOUT)]
+
+    # concurrent campaigns don't share their state.
+    other = Campaign.create("lib", 1, db_path)
+    other.set_status(FUZZING)
+    other.load_api_status()
+    assert other.can_fuzz("lib.f")
+    assert [row[4] for row in get_campaigns(db_path, "lib")] == [FUZZING, FUZZING]
+    campaign.set_status(DONE)
+    assert [row[4] for row in get_campaigns(db_path)] == [FUZZING, DONE]
+
+    # a restarted worker loads what the previous workers of the campaign recorded.
+    restarted = Campaign(campaign.run_id, "lib", db_path)
+    assert restarted.status == IMPORTING
+    restarted.load_api_status()
+    assert restarted.api_status == {"lib.f": DONE}
+
+
+def test_campaign_fork(tmp_path):
+    campaign = Campaign.create("lib", 1, tmp_path / "fuzz.db")
+    campaign.set_status(FUZZING)
+    pid = os.fork()
+    if pid == 0:
+        # the child inherits the status and opens its own connection.
+        ok = campaign.can_fuzz("lib.g") and campaign.conn is not None
+        campaign.set_api_status("lib.g", DONE)
+        campaign.flush()
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    campaign.load_api_status()
+    assert not campaign.can_fuzz("lib.g")
+
+
+def test_campaign_killed_worker(tmp_path):
+    campaign = Campaign.create("lib", 1, tmp_path / "fuzz.db")
+    campaign.set_status(FUZZING)
+    pid = os.fork()
+    if pid == 0:
+        campaign.set_api_status("lib.f", FUZZING)
+        campaign.set_api_status("lib.f", DONE)
+        campaign.set_api_status("lib.g", FUZZING)
+        os.kill(os.getpid(), signal.SIGKILL)  # e.g. stuck in lib.g
+    os.waitpid(pid, 0)
+    campaign.load_api_status()
+    assert campaign.api_status == {"lib.f": DONE}
+    campaign.set_api_status("lib.f", TIMEOUT)  # killed later on, e.g. in the API call
+    campaign.set_api_status("lib.g", TIMEOUT)
+    assert Campaign(campaign.run_id, "lib", tmp_path / "fuzz.db").conn.execute(
+        "SELECT full_name, status FROM api_status ORDER BY full_name"
+    ).fetchall() == [("lib.f", DONE), ("lib.g", TIMEOUT)]
@@ -0,0 +1,256 @@
+import json
+import sqlite3
+import threading
+
+from repfuzz.database import sqlite_proxy
+from repfuzz.database.models import API, Argument
+from repfuzz.database.sqlite_proxy import BufferedWriter
+
+
+def test_buffered_writer():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE fuzzed_api (full_name)")
+    writer = BufferedWriter(conn, "fuzzed_api", 1, flush_size=3, flush_interval=60)
+    writer.add(("a.f1",))
+    writer.add(("a.f2",))
+    assert conn.execute("SELECT COUNT(*) FROM fuzzed_api").fetchone()[0] == 0
+    writer.add(("a.f3",))
+    assert conn.execute("SELECT COUNT(*) FROM fuzzed_api").fetchone()[0] == 3
+    with writer:
+        writer.add(("a.f4",))
+    assert conn.execute("SELECT COUNT(*) FROM fuzzed_api").fetchone()[0] == 4
+
+
+def test_get_or_create_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_proxy, "LIBRARY_DATA_DIR", tmp_path)
+    monkeypatch.setattr(sqlite_proxy, "_buffered_writers", {})
+    conn = sqlite_proxy.get_or_create_db("lib")
+    assert sqlite_proxy.get_or_create_db("lib") is conn
+    sqlite_proxy.get_fuzzed_api_writer("lib").add(("lib.f",))
+    sqlite_proxy.flush_buffered_writers()
+    assert conn.execute("SELECT full_name FROM fuzzed_api").fetchall() == [("lib.f",)]
+
+    # each thread has its own connection, the writers are shared.
+    res = []
+
+    def worker():
+        thread_conn = sqlite_proxy.get_or_create_db("lib")
+        res.append(thread_conn is not conn)
+        res.append(thread_conn.execute("SELECT COUNT(*) FROM fuzzed_api").fetchone()[0])
+        sqlite_proxy.get_fuzzed_api_writer("lib").add(("lib.g",))
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    assert res == [True, 1]
+    sqlite_proxy.flush_buffered_writers()
+    assert conn.execute("SELECT COUNT(*) FROM fuzzed_api").fetchone()[0] == 2
+
+
+def test_get_or_create_db_benchmark(tmp_path, monkeypatch):
+    import time
+
+    monkeypatch.setattr(sqlite_proxy, "LIBRARY_DATA_DIR", tmp_path)
+    n = 200
+    conn = sqlite_proxy.get_or_create_db("lib")
+    db_path = tmp_path / "lib.db"
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        # what every call used to do: connect and run the DDL statements.
+        new_conn = sqlite_proxy.connect(db_path)
+        cur = new_conn.cursor()
+        for migration in sqlite_proxy.MIGRATIONS:
+            migration(cur)
+        new_conn.commit()
+    uncached = (time.perf_counter() - t0) / n
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        sqlite_proxy.get_or_create_db("lib")
+    cached = (time.perf_counter() - t0) / n
+    print(f"get_or_create_db: {uncached * 1e6:.1f}us uncached, {cached * 1e6:.1f}us cached")
+    monkeypatch.setattr(sqlite_proxy, "_migrate", None)  # the later calls don't migrate it
+    assert sqlite_proxy.get_or_create_db("lib") is conn
+
+
+def test_migrate(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_proxy, "LIBRARY_DATA_DIR", tmp_path)
+    # a database created by an older version, without indexes and with duplicates.
+    conn = sqlite3.connect(tmp_path / "lib.db")
+    conn.execute("CREATE TABLE api_call (full_name, api_call)")
+    conn.execute("CREATE TABLE fuzzed_api (full_name)")
+    conn.execute("CREATE TABLE fuzz_record (date, exec_num, time_cost)")
+    conn.executemany(
+        "INSERT INTO api_call VALUES (?, ?)",
+        [("lib.f", "lib.f(1)"), ("lib.f", "lib.f(1)"), ("lib.f", "lib.f(2)")],
+    )
+    conn.executemany("INSERT INTO fuzzed_api VALUES (?)", [("lib.f",), ("lib.f",)])
+    conn.commit()
+    conn.close()
+
+    conn = sqlite_proxy.get_or_create_db("lib")
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == sqlite_proxy.SCHEMA_VERSION
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert sqlite_proxy.query_api_call_by_full_name(conn, "lib.f") == ["lib.f(1)", "lib.f(2)"]
+    assert sqlite_proxy.get_fuzzed(conn) == [("lib.f",)]
+
+    sqlite_proxy.insert_into_api_call(conn, "lib.f", "lib.f(2)")
+    sqlite_proxy.insert_into_fuzzed_api(conn, "lib.f")
+    assert len(sqlite_proxy.query_api_call_by_full_name(conn, "lib.f")) == 2
+    assert sqlite_proxy.get_fuzzed(conn) == [("lib.f",)]
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT api_call FROM api_call WHERE full_name=?", ("lib.f",)
+    ).fetchall()
+    assert "api_call_unique" in plan[0][-1]
+    sqlite_proxy.get_or_create_db("lib")  # already migrated
+
+
+def test_insert_many(tmp_path, monkeypatch):
+    import time
+
+    monkeypatch.setattr(sqlite_proxy, "LIBRARY_DATA_DIR", tmp_path)
+    conn = sqlite_proxy.get_or_create_db("lib")
+    rows = [("lib.f", f"lib.f({i})") for i in range(500)]
+
+    t0 = time.perf_counter()
+    for full_name, api_call in rows:
+        sqlite_proxy.insert_into_api_call(conn, full_name, api_call)
+    per_row = time.perf_counter() - t0
+
+    conn.execute("DELETE FROM api_call")
+    conn.commit()
+    t0 = time.perf_counter()
+    sqlite_proxy.insert_many_into_api_call(conn, rows + rows)  # duplicates are ignored
+    bulk = time.perf_counter() - t0
+    print(f"{len(rows)} api calls: {per_row * 1e3:.1f}ms row by row, {bulk * 1e3:.1f}ms in bulk")
+    assert len(sqlite_proxy.query_api_call_by_full_name(conn, "lib.f")) == len(rows)
+
+    sqlite_proxy.set_public_apis(conn, ["lib.f", "lib.g", "lib.f"])
+    assert conn.execute("SELECT COUNT(*) FROM public_api").fetchone()[0] == 2
+    sqlite_proxy.insert_many_into_fuzzed_api(conn, ["lib.f", "lib.f"])
+    assert sqlite_proxy.get_fuzzed(conn) == [("lib.f",)]
+
+
+def _make_api(i: int) -> API:
+    return API(
+        full_name=f"lib.f{i}",
+        type="function",
+        source="def f(a, b, *, c): ...\n" * 50,
+        doc="Some documentation.\n" * 50,
+        num_normal_arg=2,
+        num_kwonly_arg=1,
+        normal_arg_list=[
+            Argument(name="a", type="int", example_value_list=[1, 2]),
+            Argument(name="b", type="str", example_value_list=["x"]),
+        ],
+        kwonly_arg_list=[Argument(name="c", type="bool", example_value_list=[True])],
+    )
+
+
+def test_api_arguments(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_proxy, "LIBRARY_DATA_DIR", tmp_path)
+    monkeypatch.setattr(sqlite_proxy, "_buffered_writers", {})
+    conn = sqlite_proxy.get_or_create_db("lib")
+    sqlite_proxy.insert_into_api(conn, _make_api(0))
+    sqlite_proxy.get_api_writer("lib").add(_make_api(1))
+    sqlite_proxy.flush_buffered_writers()
+
+    assert sqlite_proxy.query_api_by_full_name(conn, "lib.f1") == _make_api(1)
+    assert sqlite_proxy.get_all_apis(conn) == [_make_api(0), _make_api(1)]
+    assert conn.execute("SELECT COUNT(*) FROM argument").fetchone()[0] == 6
+
+    light = sqlite_proxy.get_all_apis(conn, ["full_name", "num_normal_arg", "num_kwonly_arg"])
+    assert [(api.full_name, api.num_normal_arg, api.source) for api in light] == [
+        ("lib.f0", 2, ""),
+        ("lib.f1", 2, ""),
+    ]
+    assert light[0].normal_arg_list == []
+    assert sqlite_proxy.query_api_by_full_name(conn, "lib.g") is None
+
+
+def test_migrate_arguments(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_proxy, "LIBRARY_DATA_DIR", tmp_path)
+    # a database of version 1, whose arguments are JSON blobs in the api table.
+    api = _make_api(0)
+    conn = sqlite3.connect(tmp_path / "lib.db")
+    cur = conn.cursor()
+    sqlite_proxy._migrate_v1(cur)
+    cur.execute(
+        "INSERT INTO api VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        sqlite_proxy.adapt_API(api)
+        + (
+            json.dumps([arg.to_dict() for arg in api.normal_arg_list]).encode("utf-8"),
+            json.dumps([arg.to_dict() for arg in api.kwonly_arg_list]).encode("utf-8"),
+        ),
+    )
+    cur.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+    conn = sqlite_proxy.get_or_create_db("lib")
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == sqlite_proxy.SCHEMA_VERSION
+    assert sqlite_proxy.query_api_by_full_name(conn, "lib.f0") == api
+    assert conn.execute("SELECT normal_arg_list FROM api").fetchone() == (None,)
+
+
+def test_get_all_apis_benchmark(tmp_path, monkeypatch):
+    import time
+
+    monkeypatch.setattr(sqlite_proxy, "LIBRARY_DATA_DIR", tmp_path)
+    conn = sqlite_proxy.get_or_create_db("lib")
+    sqlite_proxy.insert_many_into_api(conn, [_make_api(i) for i in range(2000)])
+
+    t0 = time.perf_counter()
+    full = sqlite_proxy.get_all_apis(conn)
+    dt_full = time.perf_counter() - t0
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    t0 = time.perf_counter()
+    light = sqlite_proxy.get_all_apis(conn, ["full_name", "num_normal_arg", "num_kwonly_arg"])
+    dt_light = time.perf_counter() - t0
+    conn.set_trace_callback(None)
+    print(
+        f"{len(full)} apis: {dt_full * 1e3:.1f}ms in full, {dt_light * 1e3:.1f}ms for names and counts"
+    )
+    assert len(light) == len(full)
+    assert [(api.num_normal_arg, api.num_kwonly_arg) for api in light] == [(2, 1)] * len(full)
+    # neither the argument table nor the source and the doc are read.
+    assert len(statements) == 1
+    assert "argument" not in statements[0]
+    assert "source" not in statements[0] and "doc" not in statements[0]
+    assert light[0].normal_arg_list == [] and light[0].source != full[0].source
+
+
+def test_iter_apis_and_api_calls(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_proxy, "LIBRARY_DATA_DIR", tmp_path)
+    conn = sqlite_proxy.get_or_create_db("lib")
+    sqlite_proxy.insert_many_into_api(conn, [_make_api(i) for i in range(10)])
+    rows = [(f"lib.f{i % 3}", f"lib.f{i % 3}({i})") for i in range(10)]
+    sqlite_proxy.insert_many_into_api_call(conn, rows)
+
+    apis = list(sqlite_proxy.iter_apis(conn, chunk_size=3))
+    assert apis == sorted(sqlite_proxy.get_all_apis(conn), key=lambda api: api.full_name)
+    names = [api.full_name for api in sqlite_proxy.iter_apis(conn, ["full_name"], chunk_size=5)]
+    assert names == sorted(f"lib.f{i}" for i in range(10))
+
+    calls = list(sqlite_proxy.iter_api_calls(conn, chunk_size=3))
+    assert [row[1:] for row in calls] == rows
+    assert [row[1:] for row in sqlite_proxy.iter_api_calls(conn, calls[6][0], 4)] == rows[7:]
+    assert sqlite_proxy.count_api_calls(conn) == {"lib.f0": 4, "lib.f1": 3, "lib.f2": 3}
+
+
+def test_api_fuzz_stats(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_proxy, "LIBRARY_DATA_DIR", tmp_path)
+    monkeypatch.setattr(sqlite_proxy, "_buffered_writers", {})
+    conn = sqlite_proxy.get_or_create_db("lib")
+    writer = sqlite_proxy.get_api_fuzz_stat_writer("lib")
+    writer.add((100, "lib.f", 10, 5, 1.0, 2, 0, 0.2))
+    writer.add((200, "lib.f", 3, 0, 3.0, 1, 3, 1.5))
+    writer.add((200, "lib.g", 10, 1, 0.5, 1, 0, 0.1))
+    writer.flush()
+    assert sqlite_proxy.get_api_fuzz_stats(conn, 0) == [
+        ("lib.f", 13, 5, 4.0, 3, 1.5),
+        ("lib.g", 10, 1, 0.5, 0, 0.1),
+    ]
+    assert sqlite_proxy.get_api_time_costs(conn) == {"lib.f": 2.0, "lib.g": 0.5}
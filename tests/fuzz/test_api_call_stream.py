@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from repfuzz.database import sqlite_proxy
+from repfuzz.fuzz.api_call_stream import ApiCallStream
+
+
+@pytest.fixture
+def library_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_proxy, "LIBRARY_DATA_DIR", tmp_path)
+    conn = sqlite_proxy.get_or_create_db("lib")
+    rows = [(f"lib.f{i % 3}", f"lib.f{i % 3}({i})") for i in range(10)]
+    sqlite_proxy.insert_many_into_api_call(conn, rows)
+    return rows
+
+
+def test_api_call_stream(library_db):
+    stream = ApiCallStream("lib", {"lib.f0", "lib.f2"}, 7, chunk_size=2)
+    res = []
+    while not stream.empty():
+        res.append(stream.get())
+    assert res == [row for row in library_db if row[0] != "lib.f1"]
+    assert stream.qsize() == 0
+    with pytest.raises(IndexError):
+        stream.get()
+
+
+def test_api_call_stream_resume(library_db):
+    # a worker killed after taking 2 API calls, the next one resumes after them.
+    stream = ApiCallStream("lib", {"lib.f0"}, 4, chunk_size=2)
+    pid = os.fork()
+    if pid == 0:
+        stream.get()
+        stream.get()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert stream.qsize() == 2
+    assert [stream.get(), stream.get()] == [("lib.f0", "lib.f0(6)"), ("lib.f0", "lib.f0(9)")]
+    assert stream.empty()
@@ -0,0 +1,65 @@
+import time
+
+import numpy as np
+
+from repfuzz.array_mutator import (
+    copy_ndarray,
+    mutate_array_bytes,
+    mutate_array_dtype,
+    mutate_array_layout,
+    mutate_array_shape,
+    mutate_array_values,
+    mutate_ndarray,
+)
+from repfuzz.mutator import get_mutator, mutate_auto
+
+
+def test_get_mutator():
+    assert get_mutator(np.zeros(3)) is mutate_ndarray
+    assert isinstance(mutate_auto(np.int64(3)), (np.generic, np.ndarray))
+
+
+def test_mutate_array_values():
+    a = np.full(100, 0.5)
+    for _ in range(20):
+        b = mutate_array_values(a)
+        assert b.shape == a.shape and b.dtype == a.dtype
+        assert not np.array_equal(b, a)
+    assert np.all(a == 0.5)  # the seed is never modified.
+
+    a = np.arange(10, dtype=np.uint8).reshape(2, 5)
+    bs = [mutate_array_bytes(a) for _ in range(10)]
+    assert all(b.shape == a.shape and b.dtype == a.dtype for b in bs)
+    assert any(not np.array_equal(b, a) for b in bs)
+    assert np.array_equal(a, np.arange(10, dtype=np.uint8).reshape(2, 5))
+
+
+def test_mutate_array_layout():
+    a = np.arange(24.0).reshape(2, 3, 4)
+    for mt in [mutate_array_shape, mutate_array_layout, mutate_array_dtype]:
+        for _ in range(20):
+            mt(a)
+    for x in [np.float32(1.5), np.zeros(()), np.zeros(0), np.array(["a", "b"]), np.array([None])]:
+        for _ in range(20):
+            mutate_auto(x)
+
+
+def test_mutate_ndarray_benchmark():
+    a = np.random.random(1 << 20)
+    n = 20
+    for mt in [mutate_array_values, mutate_array_bytes, mutate_array_shape, mutate_array_layout]:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            mt(a)
+        cost = (time.perf_counter() - t0) / n
+        print(f"{mt.__name__} on {a.size} elements: {cost * 1e6:.1f}us")
+
+
+def test_copy_ndarray_layout():
+    a = np.arange(24, dtype=np.int32).reshape(4, 6)
+    for view in [a[::-1], a[:, ::2], a.T, np.asfortranarray(a)]:
+        copied = copy_ndarray(view)
+        assert not np.may_share_memory(copied, a)
+        assert copied.strides == view.strides and (copied == view).all()
+    broadcast = np.broadcast_to(a, (2, 4, 6))
+    assert copy_ndarray(broadcast) is broadcast  # read-only, it can't be modified in place
@@ -0,0 +1,46 @@
+import time
+
+from repfuzz.fuzz.budget import ApiBudget, LibraryBudget
+from repfuzz.fuzz.heartbeat import Heartbeat
+
+
+def test_api_budget_plateau():
+    budget = ApiBudget(base=100, limit=1000, plateau=10)
+    for _ in range(9):
+        budget.spend(0)
+    assert not budget.exhausted()
+    budget.spend(0)
+    assert budget.exhausted()
+    assert budget.execs == 10
+
+
+def test_api_budget_extend():
+    budget = ApiBudget(base=10, limit=25, plateau=100)
+    for _ in range(9):
+        budget.spend(0)
+    budget.spend(3)  # new coverage at the 10th execution extends the budget to 20.
+    assert budget.budget == 20
+    for _ in range(10):
+        budget.spend(1)
+    assert budget.budget == 25  # capped by the limit.
+    for _ in range(5):
+        budget.spend(1)
+    assert budget.exhausted()
+    assert budget.execs == 25
+
+
+def test_library_budget():
+    hbs = [Heartbeat(1), Heartbeat(1)]
+    budget = LibraryBudget(hbs, None, 3)
+    budget.start()
+    hbs[0].beat()
+    hbs[1].beat()
+    assert not budget.exhausted()
+    hbs[1].beat()
+    assert budget.exhausted()
+
+    budget = LibraryBudget([], 0.1, None)
+    assert not budget.exhausted()  # the clock starts with `start()`.
+    budget.start()
+    time.sleep(0.2)
+    assert budget.exhausted()
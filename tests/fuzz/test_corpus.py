@@ -0,0 +1,28 @@
+from repfuzz.fuzz.corpus import Corpus
+
+
+def test_corpus_add():
+    corpus = Corpus.from_param_list([1, "a"], pop_size=2, iters_per_seed=10)
+    origin = corpus.choose()
+    corpus.add([2, "a"], 5, origin)
+    assert len(corpus) == 2
+    assert origin.hits == 1
+    # the population is full, a better seed replaces the worst one but not the initial one.
+    corpus.add([3, "a"], 100, origin)
+    assert len(corpus) == 2
+    assert corpus.seeds[0] is origin
+    assert corpus.seeds[1].param_list == [3, "a"]
+    # a worse seed is dropped.
+    corpus.add([4, "a"], 0, origin)
+    assert corpus.seeds[1].param_list == [3, "a"]
+
+
+def test_corpus_energy():
+    corpus = Corpus.from_param_list([1], pop_size=10, iters_per_seed=10)
+    seed = corpus.choose()
+    assert corpus.energy(seed) == 10
+    seed.hits = 2
+    assert corpus.energy(seed) == 40
+    seed.hits = 0
+    seed.picks = 5
+    assert corpus.energy(seed) == 2
@@ -0,0 +1,22 @@
+from repfuzz.fuzz import coverage
+from repfuzz.fuzz.coverage import CoverageCounter
+
+
+def test_coverage_counter(monkeypatch):
+    bitmap = {"count": 10, "scans": 0}
+
+    def count_bitmap_py():
+        bitmap["scans"] += 1
+        return bitmap["count"]
+
+    monkeypatch.setattr(coverage.dcov, "count_bitmap_py", count_bitmap_py)
+    cov = CoverageCounter()
+    assert cov.new_since_checkpoint() == 0
+    bitmap["count"] = 13
+    assert cov.new_since_checkpoint() == 3
+    assert cov.new_since_checkpoint() == 0
+    bitmap["count"] = 15
+    assert cov.checkpoint() == 15
+    assert cov.new_since_checkpoint() == 0
+    assert cov.count == 15
+    assert bitmap["scans"] == 6  # one per check
@@ -1,6 +1,16 @@
-from repfuzz.fuzz.execution_watcher import watch
+import os
+import threading
 import time
 
+import pytest
+
+from repfuzz.fuzz.execution_watcher import (
+    ExecutionTimeout,
+    LatencyStats,
+    Watchdog,
+    watch,
+)
+
 
 def handle_timeout(e: Exception):
     raise e
@@ -23,15 +33,104 @@ def test_watch_timeout1():
 
 
 def test_watch_timeout2():
-    @watch(1, handle_timeout, handle_error)
+    # a busy loop rather than a blocking call, and a second timeout in the process.
+    @watch(0.2, handle_timeout, handle_error)
     def func_2():
-        return 2**1000000000
+        while True:
+            pass
 
-    try:
-        t0 = time.time()
-        func_2()
-        dt = time.time() - t0
-        assert dt > 1
-        assert dt < 2
-    except Exception as e:
-        assert isinstance(e, TimeoutError)
+    @watch(0.2, handle_timeout, handle_error)
+    def func_3():
+        time.sleep(20)
+
+    @watch(10, handle_timeout, handle_error)
+    def outer():  # the watchdogs of the nested functions share the signal handler
+        for func in (func_2, func_3):
+            with pytest.raises(TimeoutError):
+                func()
+
+    for func in (func_2, func_3):
+        with pytest.raises(TimeoutError):
+            func()
+    t0 = time.monotonic()
+    outer()
+    print(f"Nested timeouts in {time.monotonic() - t0:.2f}s")
+
+
+def test_watch_error():
+    @watch(1, handle_timeout, handle_error)
+    def func():
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        func()
+
+
+def test_watchdog_escalation():
+    watchdog = Watchdog(0.1, 0.2)
+    thread_num = threading.active_count()
+
+    swallowed = []
+
+    def swallow():
+        try:
+            time.sleep(20)
+        except BaseException as e:  # the signal is swallowed, the async exception stops the loop.
+            swallowed.append(e)
+        while True:
+            pass
+
+    assert not watchdog.run(swallow)
+    assert len(swallowed) == 1 and isinstance(swallowed[0], ExecutionTimeout)
+    assert watchdog.run(lambda: None)
+    assert threading.active_count() == thread_num + 1  # one thread for all the executions
+
+
+def test_watchdog_nested():
+    watchdog = Watchdog(0.2, 0.2)
+
+    def outer():
+        for _ in range(3):  # each execution has its own deadline
+            assert watchdog.run(time.sleep, 0.1)
+        assert not watchdog.run(time.sleep, 1)
+
+    assert watchdog.run(outer)
+    watchdog._handle_signal(None, None)  # a late signal of a finished execution is ignored
+    watchdog._fired = watchdog._exec[0]
+    with pytest.raises(ExecutionTimeout):
+        watchdog._handle_signal(None, None)
+
+
+def test_watchdog_fork():
+    watchdog = Watchdog(0.1, 0.1)
+    assert watchdog.run(lambda: None)
+    pid = os.fork()
+    if pid == 0:
+        # the child starts its own thread, the one of the parent is gone.
+        ok = not watchdog.run(time.sleep, 5)
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+
+def test_watchdog_benchmark():
+    watchdog = Watchdog(1, 1)
+    n = 100000
+
+    def f():
+        pass
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        watchdog.run(f)
+    cost = (time.perf_counter() - t0) / n
+    print(f"Watchdog.run: {cost * 1e9:.0f}ns per execution")
+
+
+def test_latency_stats():
+    stats = LatencyStats()
+    stats.add(0.1, True)
+    stats.add(0.5, False)
+    assert stats.exec_num == 2 and stats.timeout_num == 1
+    assert stats.max == 0.5
+    assert stats.mean == pytest.approx(0.3)
@@ -1,4 +1,17 @@
+import os
+import signal
+from types import SimpleNamespace
+
+import pytest
+
+from repfuzz.config import FUZZ
+from repfuzz.database import sqlite_proxy
+from repfuzz.database.campaign import FUZZING, Campaign
+from repfuzz.fuzz import fuzz_api as fuzz_api_module
+from repfuzz.fuzz.budget import LibraryBudget
 from repfuzz.fuzz.fuzz_api import fuzz_api
+from repfuzz.fuzz.heartbeat import Heartbeat
+from repfuzz.fuzz.repro import ReproBuffer
 
 
 def test_fuzz_api():
@@ -6,3 +19,56 @@ def test_fuzz_api():
         return a + str(b) + str(c)
 
     fuzz_api(x, ["x", 1, (1, 2)])
+
+
+def finished_api(x):
+    return x
+
+
+def outer_api(x):
+    fuzz_api(finished_api, x)  # e.g. an instrumented function called by the mutant
+    assert fuzz_api_module.current_api.value == f"{__name__}.outer_api"
+
+
+def killed_api(x):
+    os.kill(os.getpid(), signal.SIGKILL)  # e.g. by the parent, stuck in a C extension
+
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    """
+    The state `safe_fuzz` sets up in a worker.
+    """
+    monkeypatch.setattr(sqlite_proxy, "LIBRARY_DATA_DIR", tmp_path)
+    monkeypatch.setattr(FUZZ, "iters_per_api", 10)
+    monkeypatch.setattr(FUZZ, "plateau_iters", 10)
+    campaign = Campaign.create("lib", 1, tmp_path / "fuzz.db")
+    campaign.set_status(FUZZING)
+    heartbeat = Heartbeat(FUZZ.stall_timeout)
+    monkeypatch.setattr(fuzz_api_module, "campaign", campaign)
+    monkeypatch.setattr(fuzz_api_module, "current_api", SimpleNamespace(value=""))
+    monkeypatch.setattr(fuzz_api_module, "heartbeat", heartbeat)
+    monkeypatch.setattr(fuzz_api_module, "repro", ReproBuffer(4, 1024, 1024, 1024))
+    monkeypatch.setattr(fuzz_api_module, "budget", LibraryBudget([heartbeat], None, None))
+    return __name__.split(".")[0]  # the database of the fuzzed "library"
+
+
+def test_fuzz_api_killed_worker(worker):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            fuzz_api(finished_api, 1)
+            fuzz_api(killed_api, 1)
+        finally:
+            os._exit(1)
+    os.waitpid(pid, 0)
+    conn = sqlite_proxy.get_or_create_db(worker)
+    fuzzed = [row[0] for row in conn.execute("SELECT full_name FROM fuzzed_api")]
+    assert fuzzed == [f"{__name__}.finished_api"]
+    stats = conn.execute("SELECT full_name, exec_num FROM api_fuzz_stat").fetchall()
+    assert len(stats) == 1 and stats[0][0] == f"{__name__}.finished_api" and stats[0][1] > 0
+
+
+def test_fuzz_api_current_api(worker):
+    fuzz_api(outer_api, 1)
+    assert fuzz_api_module.current_api.value == ""  # the API call may hang later on
@@ -0,0 +1,47 @@
+import argparse
+import time
+
+import pytest
+
+from repfuzz.database import sqlite_proxy
+from repfuzz.fuzz import fuzz_library
+from repfuzz.fuzz.fuzz_library import positive_int, record_killed_api, shard_api_calls
+from repfuzz.fuzz.heartbeat import Heartbeat
+
+
+def test_shard_api_calls():
+    counts = {"lib.a": 10, "lib.b": 6, "lib.c": 4, "lib.d": 1}
+    shards = shard_api_calls(counts, 2)
+    assert [sum(shard.values()) for shard in shards] == [11, 10]
+
+    # the slow APIs are spread over the shards, whatever their number of API calls.
+    shards = shard_api_calls(counts, 2, {"lib.a": 1.0, "lib.c": 30.0, "lib.d": 20.0})
+    # lib.b was never fuzzed, its cost is the mean of the others.
+    assert sorted(sorted(shard) for shard in shards) == [["lib.a", "lib.c"], ["lib.b", "lib.d"]]
+
+
+def test_shard_api_calls_no_jobs(monkeypatch):
+    with pytest.raises(ValueError, match="at least 1"):
+        shard_api_calls({"lib.a": 1}, 0)
+    monkeypatch.setattr(fuzz_library, "get_or_create_db", None)  # rejected before
+    with pytest.raises(ValueError, match="at least 1"):
+        fuzz_library.fuzz_one_library("lib", -1)
+    assert positive_int("2") == 2
+    with pytest.raises(argparse.ArgumentTypeError):
+        positive_int("0")
+
+
+def test_record_killed_api(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_proxy, "LIBRARY_DATA_DIR", tmp_path)
+    heartbeat = Heartbeat(10)
+    heartbeat.new_api()
+    heartbeat.beat()
+    heartbeat.arm()  # the execution the worker is stuck in
+    time.sleep(0.1)
+    record_killed_api("lib", "lib.f", heartbeat)
+    sqlite_proxy.flush_buffered_writers()
+    conn = sqlite_proxy.get_or_create_db("lib")
+    (row,) = conn.execute("SELECT * FROM api_fuzz_stat").fetchall()
+    assert row[1:4] == ("lib.f", 2, 0) and row[6] == 1
+    assert row[4] >= 0.1 and row[7] >= 0.1  # the time of the API and of its last execution
+    assert sqlite_proxy.get_api_time_costs(conn) == {"lib.f": row[4]}
@@ -0,0 +1,44 @@
+import time
+from multiprocessing import Process
+
+from repfuzz.fuzz.heartbeat import Heartbeat
+
+
+def test_heartbeat_beat():
+    hb = Heartbeat(0.2)
+    hb.reset()
+    hb.beat()
+    hb.beat()
+    assert hb.exec_num == 2
+    assert hb.api_exec_num == 2
+    hb.new_api()
+    assert hb.api_exec_num == 0
+    assert 0 <= hb.api_time <= hb.exec_time  # armed by `reset`, before the API started
+    assert not hb.expired()
+    time.sleep(0.3)
+    assert hb.expired()
+
+
+def _worker(hb: Heartbeat):
+    for _ in range(100):
+        hb.beat()
+    hb.finish()
+
+
+def test_heartbeat_shared():
+    hb = Heartbeat(1)
+    hb.reset()
+    p = Process(target=_worker, args=(hb,))
+    p.start()
+    p.join()
+    assert hb.done
+    assert hb.exec_num == 100
+
+
+def test_heartbeat_arm_timeout():
+    hb = Heartbeat(10)
+    hb.arm(0.1)  # e.g. the kill timeout of the next execution
+    time.sleep(0.2)
+    assert hb.expired()
+    hb.beat()
+    assert not hb.expired()
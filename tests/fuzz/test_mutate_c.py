@@ -1,4 +1,17 @@
-from repfuzz.mutate import mutate_int, mutate_float, mutate_str, mutate_bytes
+import time
+
+from repfuzz.mutate import (
+    mutate_buffer,
+    mutate_bytes,
+    mutate_bytes_n,
+    mutate_float,
+    mutate_float_n,
+    mutate_int,
+    mutate_int_n,
+    mutate_str,
+    mutate_str_n,
+    seed,
+)
 
 
 def test_mutate_int():
@@ -42,3 +55,84 @@ def test_mutate_bytes():
     print(f"data={data}")
     assert new_data != data
     assert data == b"Hello, World!"
+
+
+def test_mutate_bytes_nul():
+    data = b"\x00\x01\x00" * 100
+    for _ in range(200):
+        new_data = mutate_bytes(data)
+        assert isinstance(new_data, bytes)
+    for _ in range(200):
+        assert isinstance(mutate_str("h\u00e9llo\x00w\u00f6rld"), str)
+
+
+def test_mutate_buffer():
+    data = bytearray(b"Hello, World!")
+    assert mutate_buffer(data) is data  # mutated in place
+    assert len(data) == 13
+    data = b"Hello, World!"
+    new_data = mutate_buffer(data)  # copy-on-write
+    assert isinstance(new_data, bytes) and len(new_data) == 13
+    assert data == b"Hello, World!"
+
+
+def test_mutate_n():
+    assert mutate_int_n(10, 0) == []
+    assert all(isinstance(x, int) for x in mutate_int_n(10, 5))
+    assert all(isinstance(x, float) for x in mutate_float_n(3.14, 5))
+    assert all(isinstance(x, str) for x in mutate_str_n("Hello", 5))
+    assert all(isinstance(x, bytes) for x in mutate_bytes_n(b"Hello", 5))
+    assert len(mutate_bytes_n(b"Hello", 100)) == 100
+    seed(42)
+    a = mutate_bytes_n(b"Hello, World!", 10)
+    seed(42)
+    assert a == [mutate_bytes(b"Hello, World!") for _ in range(10)]
+
+
+def test_mutate_n_benchmark():
+    n, k = 1000, 10
+    for mutate_one, mutate_n, data in [
+        (mutate_int, mutate_int_n, 12345),
+        (mutate_float, mutate_float_n, 3.14),
+        (mutate_str, mutate_str_n, "Hello, World!"),
+        (mutate_bytes, mutate_bytes_n, b"Hello, World!"),
+    ]:
+        t0 = time.perf_counter()
+        for _ in range(n * k):
+            mutate_one(data)
+        per_call = (time.perf_counter() - t0) / (n * k)
+        t0 = time.perf_counter()
+        for _ in range(n):
+            mutate_n(data, k)
+        batched = (time.perf_counter() - t0) / (n * k)
+        print(
+            f"{mutate_one.__name__}: {per_call * 1e9:.0f}ns per call, {batched * 1e9:.0f}ns batched"
+        )
+
+
+def test_seed():
+    seed(42)
+    a = [mutate_bytes(b"Hello, World!") for _ in range(10)]
+    seed(42)
+    b = [mutate_bytes(b"Hello, World!") for _ in range(10)]
+    assert a == b
+    seed(43)
+    c = [mutate_bytes(b"Hello, World!") for _ in range(10)]
+    assert a != c
+
+
+def test_mutate_bytes_benchmark():
+    data = bytes(range(256)) * 4
+    n = 2000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        mutate_bytes(data)
+    dt = time.perf_counter() - t0
+    print(f"mutate_bytes: {n / dt:.0f} mutants/s, {n * len(data) / dt / 1e6:.2f} MB/s")
+
+    data = bytearray(data)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        mutate_buffer(data)
+    dt = time.perf_counter() - t0
+    print(f"mutate_buffer: {n / dt:.0f} mutants/s, {n * len(data) / dt / 1e6:.2f} MB/s")
@@ -1,3 +1,5 @@
+import pytest
+
 from repfuzz.mutator import *
 
 
@@ -69,6 +71,8 @@ def test_mutate_bytearray():
     a = bytearray([1, 2, 3])
     b = mutate_bytearray(a)
     assert isinstance(b, bytearray) and b != a
+    assert a == bytearray([1, 2, 3])
+    assert get_mutator(a) is mutate_bytearray
 
 
 def test_mutate_dict():
@@ -116,3 +120,122 @@ def test_mutate_param_list():
     b = mutate_param_list(a)
     assert len(a) == len(b)
     mutate_param_list([])
+
+
+def test_mutate_param_list_sharing():
+    big = list(range(100000))
+    a = [big, 1]
+    for _ in range(20):
+        b = mutate_param_list(a)
+        assert a[0] is big and a[1] == 1  # the seed is never modified.
+        assert big == list(range(100000))
+    b = mutate_param_list([1])
+    assert b != [1]
+
+    d = {"big": big, "x": 1}
+    b = mutate_dict(d)
+    assert d == {"big": big, "x": 1}
+    assert b["big"] is big or b["x"] is d["x"]
+
+
+def test_mutate_param_list_benchmark():
+    import time
+
+    big_dict = {i: [i, str(i)] for i in range(20000)}
+    big_list = [[i] for i in range(20000)]
+    a = [big_dict, big_list, 1, "s", b"b"]
+    n = 100
+
+    t0 = time.perf_counter()
+    mutants = [mutate_param_list(a) for _ in range(n)]
+    mutate_cost = (time.perf_counter() - t0) / n
+    print(f"mutate_param_list: {mutate_cost * 1e3:.3f}ms per mutant")
+
+    # the slots which are not mutated are shared, the mutated ones are not deep-copied.
+    assert any(b[0] is big_dict or b[1] is big_list for b in mutants)
+    for b in mutants:
+        if b[1] is not big_list and len(b[1]) == len(big_list):
+            assert b[1][0] is big_list[0] or b[1][-1] is big_list[-1]
+
+
+def test_mutate_param_list_in_place_api():
+    np = pytest.importorskip("numpy")
+
+    def api(*args):  # modifies its arguments in place
+        for x in args:
+            if isinstance(x, list):
+                x.append(0)
+            elif isinstance(x, dict):
+                x["new"] = 0
+            elif isinstance(x, np.ndarray) and x.flags.writeable:
+                x[...] = 0
+
+    caller = [[1, 2, 3], {"k": 1}, np.arange(1, 4), bytearray(b"abc"), 5]
+    seed = copy_param_list(caller)
+    assert all(new is not old for new, old in zip(seed[:4], caller))
+    for _ in range(100):
+        mutant = mutate_param_list(seed)
+        for new, old in zip(mutant, seed):  # a mutated array is never a view of the seed
+            if isinstance(new, np.ndarray) and new is not old and new.flags.writeable:
+                assert not np.may_share_memory(new, old)
+        api(*mutant)
+    assert caller[0] == [1, 2, 3] and caller[1] == {"k": 1} and caller[3] == b"abc"
+    assert caller[2].tolist() == [1, 2, 3]
+
+
+def test_get_mutator():
+    class A:
+        pass
+
+    assert get_mutator(1) is mutate_int
+    assert get_mutator([1]) is mutate_list
+    assert get_mutator(A()) is mutate_instance
+    assert mutate_auto(None) is None
+    assert mutate_auto(A) is A
+
+
+def test_mutate_auto_benchmark(monkeypatch):
+    import time
+
+    import repfuzz.mutator
+
+    values = [1, 2.0, "s", b"b", [1, [2, "s"]], (1, 2), {1, 2}, {"a": [1, 2]}, object()]
+    n = 2000
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        for value in values:
+            globals()[f"mutate_{get_type(value)}"]
+    scan_cost = (time.perf_counter() - t0) / n / len(values)
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        for value in values:
+            get_mutator(value)
+    dispatch_cost = (time.perf_counter() - t0) / n / len(values)
+
+    nested = [[i, (str(i), {i: [float(i)]})] for i in range(100)]
+    t0 = time.perf_counter()
+    for _ in range(10):
+        for value in nested:
+            mutate_auto(value)
+    mutate_cost = (time.perf_counter() - t0) / 10 / len(nested)
+
+    print(
+        f"isinstance scan: {scan_cost * 1e6:.3f}us, dispatch: {dispatch_cost * 1e6:.3f}us, "
+        f"nested mutate_auto: {mutate_cost * 1e6:.3f}us"
+    )
+    # the type of a value is only scanned the first time it is seen, then it is cached.
+    scanned = []
+    scan = repfuzz.mutator.get_type
+    monkeypatch.setattr(
+        repfuzz.mutator, "get_type", lambda value: scanned.append(value) or scan(value)
+    )
+
+    class B:
+        pass
+
+    b = B()
+    for value in values + [b, B(), b]:
+        assert get_mutator(value) is get_mutator(value)
+    assert scanned == [b]
@@ -0,0 +1,136 @@
+import itertools
+import os
+import time
+
+import pytest
+
+from repfuzz.fuzz.repro import ReproBuffer
+
+
+def api(a, b=0):
+    return a + b
+
+
+def test_repro_dump():
+    repro = ReproBuffer(2, 1024, 1024, 1024)
+    repro.set_api_call("api(1, b=2)")
+    repro.record(api, (1,), {"b": 2})
+    repro.record(api, (3,), {"b": 4})
+    repro.record(api, (5,), {"b": 6})
+    repro.dump()
+    api_call, triggering_code = repro.read()
+    assert api_call == "api(1, b=2)"
+    assert "args=[1]" not in triggering_code
+    assert "# args=[3]" in triggering_code
+    assert "\nargs=[5]\nkwargs={'b': 6}\n" in triggering_code
+
+
+def test_repro_request_dump():
+    repro = ReproBuffer(4, 1024, 1024, 1024)
+    pid = os.fork()
+    if pid == 0:
+        repro.install()
+        repro.set_api_call("api('x')")
+        repro.record(api, ("x",), {})
+        repro.record(api, ("y",), {})
+        while True:
+            pass
+    try:
+        time.sleep(0.2)
+        assert repro.request_dump(pid, 5)
+    finally:
+        os.kill(pid, 9)
+        os.waitpid(pid, 0)
+    api_call, triggering_code = repro.read()
+    assert api_call == "api('x')"
+    assert "# args=['x']" in triggering_code
+    assert "\nargs=['y']" in triggering_code
+
+
+def test_repro_stuck_in_c():
+    repro = ReproBuffer(4, 1024, 1024, 1024)
+    pid = os.fork()
+    if pid == 0:
+        repro.install()
+        repro.set_api_call("sum(x)")
+        repro.record(sum, (itertools.repeat(1, 10**12),), {})
+        repro.record(api, ([1, 2],), {"b": 3})
+        sum(itertools.repeat(1, 10**12))  # never runs the handler of the signal
+        os._exit(0)
+    try:
+        time.sleep(0.2)
+        assert not repro.request_dump(pid, 0.5)
+    finally:
+        os.kill(pid, 9)
+        os.waitpid(pid, 0)
+    api_call, triggering_code = repro.read()
+    assert api_call == "sum(x)"
+    assert triggering_code.startswith("import ")  # the last mutant, the only one recorded
+    assert "\nargs=[[1, 2]]\nkwargs={'b': 3}\n" in triggering_code
+
+
+def test_repro_huge_argument():
+    repro = ReproBuffer(1, 1024, 1024, 1024)
+    repro.record(api, ("x" * 4096,), {})
+    _, triggering_code = repro.read()
+    assert triggering_code.startswith("# Can't serialize")
+    repro.dump()
+    _, triggering_code = repro.read()
+    assert triggering_code.startswith("# Can't serialize")
+
+    # too large to be written before the execution, but not for the dump.
+    repro = ReproBuffer(1, 1024, 1 << 14, 1024)
+    repro.record(api, ("x" * 4096,), {})
+    repro.dump()
+    _, triggering_code = repro.read()
+    assert triggering_code.startswith("import ")
+    assert triggering_code.count("args=") == 2  # args and kwargs, only once
+
+
+def test_repro_dump_method():
+    from difflib import SequenceMatcher
+
+    repro = ReproBuffer(1, 1024, 1024, 1024)
+    repro.record(SequenceMatcher.ratio, ("x",), {})
+    repro.dump()
+    _, triggering_code = repro.read()
+    assert "difflib.SequenceMatcher.ratio(*args, **kwargs)" in triggering_code
+
+
+def test_repro_dump_in_place_api():
+    repro = ReproBuffer(1, 1024, 1024, 1024)
+    a, b = [1, 2], {"x": 1}
+    repro.record(api, (a,), {"b": b})
+    a.append(3)  # e.g. `list.append` being fuzzed
+    b.clear()
+    repro.dump()
+    _, triggering_code = repro.read()
+    assert "\nargs=[[1, 2]]\nkwargs={'b': {'x': 1}}\n" in triggering_code
+
+
+def test_repro_nested_api():
+    repro = ReproBuffer(2, 1024, 1024, 1024)
+    repro.begin_api()
+    repro.record(api, (1,), {})
+    repro.begin_api()  # e.g. an instrumented function called by the mutant
+    repro.record(api, (2,), {})
+    assert "args=[2]" in repro.read()[1]
+    repro.end_api()
+    repro.dump()
+    _, triggering_code = repro.read()
+    assert "args=[1]" in triggering_code and "args=[2]" not in triggering_code
+    repro.end_api()
+    assert repro.read()[1] == ""
+
+
+def test_repro_record_benchmark():
+    np = pytest.importorskip("numpy")
+    repro = ReproBuffer(4, 1024, 1 << 20, 1 << 14)
+    big = np.zeros(1 << 21)
+    n = 1000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        repro.record(api, (big, [1, 2, 3]), {"b": "s"})
+    cost = (time.perf_counter() - t0) / n
+    print(f"record with a {big.nbytes >> 20}MB array: {cost * 1e6:.1f}us")
+    assert repro.read()[1].startswith("# Can't serialize")
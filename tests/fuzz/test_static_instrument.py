@@ -0,0 +1,145 @@
+import importlib
+import sys
+import time
+
+import pytest
+
+from repfuzz.fuzz import static_instrument
+from repfuzz.fuzz.static_instrument import instrument_function
+
+
+@pytest.fixture
+def fuzzed(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        static_instrument, "fuzz_api", lambda api, *args, **kwargs: calls.append(args)
+    )
+    monkeypatch.setattr(static_instrument, "fuzzing", True)
+    return calls
+
+
+def test_instrument_function(fuzzed):
+    def f(x):
+        if x < 0:
+            raise ValueError
+        return x + 1
+
+    wrapped = instrument_function(f)
+    assert wrapped.__wrapped__ is f
+    with pytest.raises(ValueError):
+        wrapped(-1)
+    assert fuzzed == []  # a failed call is not fuzzed.
+    assert wrapped(1) == 2
+    assert wrapped(2) == 3
+    assert fuzzed == [(1,)]  # only the first successful call is fuzzed.
+
+
+def test_instrument_function_not_fuzzing(fuzzed, monkeypatch):
+    monkeypatch.setattr(static_instrument, "fuzzing", False)  # e.g. the library is imported
+    wrapped = instrument_function(lambda x: x)
+    assert wrapped(1) == 1
+    monkeypatch.setattr(static_instrument, "fuzzing", True)
+    assert wrapped(2) == 2
+    assert fuzzed == [(2,)]
+
+
+def test_instrument_function_benchmark(fuzzed):
+    np = pytest.importorskip("numpy")
+    a = np.arange(8)
+    wrapped = instrument_function(np.sum)
+    wrapped(a)
+    n = 20000
+
+    def bench(func):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            func(a)
+        return (time.perf_counter() - t0) / n
+
+    rounds = [(bench(np.sum), bench(wrapped)) for _ in range(20)]  # interleaved against noise
+    unwrapped_cost = min(r[0] for r in rounds)
+    wrapped_cost = min(r[1] for r in rounds)
+    print(f"numpy.sum: {unwrapped_cost * 1e9:.0f}ns unwrapped, {wrapped_cost * 1e9:.0f}ns wrapped")
+    assert wrapped(a) == np.sum(a) and fuzzed == [(a,)]  # only the first call is fuzzed
+    assert wrapped_cost < 3 * unwrapped_cost + 5e-6
+
+
+@pytest.fixture
+def package(tmp_path, monkeypatch, fuzzed):
+    pkg = tmp_path / "instrumented_pkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text(
+        "from instrumented_pkg.a import f\nfrom instrumented_pkg import a\n\ndef g(x):\n    return f(x)\n"
+    )
+    (pkg / "a.py").write_text(
+        "def f(x):\n    return x + 1\n\n"
+        "class Base:\n    def __init__(self, x):\n        self.x = x\n\n"
+        "    def inc(self):\n        return f(self.x)\n\n"
+        "class Counter(Base):\n    @staticmethod\n    def zero():\n        return 0\n\n"
+        "    def _private(self):\n        return self.x\n"
+    )
+    (pkg / "lazy.py").write_text("def h(x):\n    return x\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(sys, "meta_path", list(sys.meta_path))
+    monkeypatch.setattr(static_instrument.FUZZ, "instrument_plan_dir", tmp_path / "plans")
+
+    def reset():
+        for name in [m for m in sys.modules if m.startswith("instrumented_pkg")]:
+            del sys.modules[name]
+        monkeypatch.setattr(static_instrument, "mod_has_been_seen", set())
+        monkeypatch.setattr(static_instrument, "classes_have_been_seen", set())
+        monkeypatch.setattr(static_instrument, "top_mod", None)
+        monkeypatch.setattr(static_instrument, "top_mod_name", None)
+        sys.meta_path[:] = [
+            f for f in sys.meta_path if not isinstance(f, static_instrument.InstrumentFinder)
+        ]
+        return importlib.import_module("instrumented_pkg")
+
+    yield reset
+    reset()
+
+
+def test_instrument_module(package):
+    pkg = package()
+    static_instrument.instrument_module(pkg)
+    assert pkg.g.original__func.__name__ == "g"
+    assert pkg.a.f.original__func.__name__ == "f"
+    assert list((static_instrument.FUZZ.instrument_plan_dir).glob("instrumented_pkg-*.json"))
+
+    # a submodule imported after the instrumentation is instrumented by the import hook.
+    lazy = importlib.import_module("instrumented_pkg.lazy")
+    assert lazy.h.original__func.__name__ == "h"
+    assert lazy.h(1) == 1
+
+
+def test_instrument_module_cached_plan(package, monkeypatch):
+    static_instrument.instrument_module(package())
+    pkg = package()
+
+    def discover(mod, plan):
+        raise AssertionError("the cached plan should be used")
+
+    monkeypatch.setattr(static_instrument, "discover", discover)
+    static_instrument.instrument_module(pkg)
+    assert pkg.g.original__func.__name__ == "g"
+    assert pkg.a.f.original__func.__name__ == "f"
+    assert pkg.a.f(1) == 2
+
+
+def test_instrument_class(package, monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        static_instrument, "fuzz_api", lambda api, *args, **kwargs: calls.append((api, args))
+    )
+    pkg = package()
+    static_instrument.instrument_module(pkg)
+    Base, Counter = pkg.a.Base, pkg.a.Counter
+    assert "original__func" not in vars(Counter)["_private"].__dict__
+
+    counter = Counter(1)  # the inherited __init__ fuzzes the constructed class.
+    assert counter.inc() == 2
+    assert Counter.zero() == 0
+    assert calls[0] == (Counter, (1,))
+    assert calls[1] == (pkg.a.f.original__func, (1,))  # called by the method, which returns after it
+    assert calls[2] == (Base.inc.original__func, (counter,))  # the receiver is an argument.
+    assert calls[3] == (Counter.zero.original__func, ())
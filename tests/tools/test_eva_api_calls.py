@@ -0,0 +1,29 @@
+from repfuzz.tools.eva_api_calls import Evaluator, batched
+
+
+def test_batched():
+    rows = [(i, "lib.f", f"lib.f({i})") for i in range(1, 6)]
+    assert list(batched(rows, 2)) == [
+        [(1, "lib.f(1)"), (2, "lib.f(2)")],
+        [(3, "lib.f(3)"), (4, "lib.f(4)")],
+        [(5, "lib.f(5)")],
+    ]
+
+
+def test_evaluator():
+    evaluator = Evaluator("lib", timeout=0.5)
+    batch = [
+        (1, "x = 1"),
+        (2, "raise ValueError"),
+        (3, "import os\nos.kill(os.getpid(), 19)"),  # SIGSTOP, so it hangs
+        (4, "x = 2"),
+        (5, "import os\nos._exit(1)"),
+        (6, "x = 3"),
+    ]
+    res = list(evaluator.run(batch))
+    # no API call is skipped after a timeout or a crash.
+    assert res == [(1, True), (2, True), (3, False), (4, True), (5, False), (6, True)]
+    assert evaluator.restart_num == 2
+    assert list(evaluator.run([(7, "x = 4")])) == [(7, True)]  # the same process is reused.
+    assert evaluator.restart_num == 2
+    evaluator.close()